@@ -0,0 +1,187 @@
+# encoder micro-benchmark: cv2, PIL and the optional turbo-jpeg/webp backends across resolutions and quality levels, plus the cost of the
+# base64 + json wrapping which _publish does for every frame. The frames are synthetic ones and, if given, real ones from images or videos.
+#
+#   python -m bench.codec_bench --image snapshot.jpg --video camera.mp4 --output codec_bench.json
+import argparse
+import base64
+import json
+import platform
+import time
+from io import BytesIO
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+RESOLUTIONS = {'360p': (640, 360), '720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='encoder micro-benchmark')
+    parser.add_argument('--image', nargs='*', default=[], help='real frames from image files')
+    parser.add_argument('--video', nargs='*', default=[], help='real frames from the middle of video files')
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS.keys()), choices=list(RESOLUTIONS.keys()))
+    parser.add_argument('--qualities', nargs='+', type=int, default=[50, 75, 90, 95])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', default='codec_bench.json')
+    return parser.parse_args()
+
+
+# a gradient with some shapes, text and sensor-like noise, which compresses roughly like a camera frame unlike a random one
+def create_synthetic_frame(width: int, height: int) -> np.array:
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))]).astype(np.uint8)
+    rng = np.random.default_rng(7)
+    for _ in range(12):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.circle(img, center, int(rng.integers(height // 20, height // 5)), color, -1)
+    cv2.putText(img, '2024-01-01 12:00:00 CAM 1', (width // 40, height // 12), cv2.FONT_HERSHEY_SIMPLEX, height / 720., (255, 255, 255), 2)
+    noise = rng.normal(0, 4, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def _read_video_frame(path: str) -> np.array:
+    cap = cv2.VideoCapture(path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count // 2)
+        succeed, img = cap.read()
+        return img if succeed else None
+    finally:
+        cap.release()
+
+
+def load_frames(bench_args) -> List[Tuple[str, np.array]]:
+    frames = []
+    for path in bench_args.image:
+        img = cv2.imread(path)
+        if img is not None:
+            frames.append((path, img))
+        else:
+            print(f'{path} could not be read, it is skipped')
+    for path in bench_args.video:
+        img = _read_video_frame(path)
+        if img is not None:
+            frames.append((path, img))
+        else:
+            print(f'no frame could be read from {path}, it is skipped')
+    return frames
+
+
+def _create_cv2_encoder(ext: str, flag: int) -> Callable[[np.array, int], bytes]:
+    def encode(img: np.array, quality: int) -> bytes:
+        return cv2.imencode(ext, img, [flag, quality])[1].tobytes()
+
+    return encode
+
+
+def _create_pil_encoder(fmt: str) -> Callable[[np.array, int], bytes]:
+    from PIL import Image
+
+    def encode(img: np.array, quality: int) -> bytes:
+        buffered = BytesIO()
+        # the frames are bgr, the conversion is a part of the cost
+        Image.fromarray(img[:, :, ::-1]).save(buffered, format=fmt, quality=quality)
+        return buffered.getvalue()
+
+    return encode
+
+
+def _create_turbojpeg_encoder() -> Callable[[np.array, int], bytes]:
+    from turbojpeg import TurboJPEG
+    jpeg = TurboJPEG()
+
+    def encode(img: np.array, quality: int) -> bytes:
+        return jpeg.encode(img, quality=quality)
+
+    return encode
+
+
+# the optional ones are skipped if they are not installed
+def get_encoders() -> Dict[str, Callable[[np.array, int], bytes]]:
+    encoders = {'cv2-jpeg': _create_cv2_encoder('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+                'cv2-webp': _create_cv2_encoder('.webp', cv2.IMWRITE_WEBP_QUALITY)}
+    for name, create in (('pil-jpeg', lambda: _create_pil_encoder('JPEG')), ('pil-webp', lambda: _create_pil_encoder('WEBP')),
+                         ('turbojpeg', _create_turbojpeg_encoder)):
+        try:
+            encoder = create()
+            encoder(create_synthetic_frame(64, 64), 75)
+            encoders[name] = encoder
+        except BaseException as ex:
+            print(f'{name} is not available, it is skipped ({ex})')
+    return encoders
+
+
+def _wrap(buff: bytes) -> str:
+    img_str = base64.b64encode(buff).decode()
+    dic = {'name': 'bench camera', 'img': img_str, 'source': 'bench', 'ai_clip_enabled': False}
+    return json.dumps(dic, ensure_ascii=False)
+
+
+def _measure(fn: Callable, iterations: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started_at)
+    return timings
+
+
+def _summarize_ms(timings: List[float]) -> dict:
+    values = np.array(timings) * 1000.
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)), 'p99': float(np.percentile(values, 99))}
+
+
+def run(bench_args) -> List[dict]:
+    encoders = get_encoders()
+    real_frames = load_frames(bench_args)
+    _print_header()
+    results = []
+    for resolution in bench_args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        frames = [('synthetic', create_synthetic_frame(width, height))]
+        frames += [(name, cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)) for name, img in real_frames]
+        for frame_name, img in frames:
+            for encoder_name, encode in encoders.items():
+                for quality in bench_args.qualities:
+                    encoded = encode(img, quality)
+                    encode_ms = _summarize_ms(_measure(lambda: encode(img, quality), bench_args.iterations, bench_args.warmup))
+                    wrap_ms = _summarize_ms(_measure(lambda: _wrap(encoded), bench_args.iterations, bench_args.warmup))
+                    results.append({'resolution': resolution, 'frame': frame_name, 'encoder': encoder_name, 'quality': quality,
+                                    'bytes': len(encoded), 'wrapped_bytes': len(_wrap(encoded)), 'encode_ms': encode_ms, 'wrap_ms': wrap_ms})
+                    _print_row(results[-1])
+    return results
+
+
+def _print_header():
+    header = (f'{"res":>6} {"frame":>12} {"encoder":>10} {"q":>4} {"KB":>8} {"enc p50":>8} {"enc p99":>8} {"wrap p50":>9} '
+              f'{"wrap p99":>9} {"fps":>7}')
+    print(header)
+    print('-' * len(header))
+
+
+def _print_row(r: dict):
+    frame = r['frame'] if len(r['frame']) <= 12 else '...' + r['frame'][-9:]
+    total_ms = r['encode_ms']['mean'] + r['wrap_ms']['mean']
+    print(f'{r["resolution"]:>6} {frame:>12} {r["encoder"]:>10} {r["quality"]:>4} {r["bytes"] / 1024.:>8.1f} {r["encode_ms"]["p50"]:>8.2f} '
+          f'{r["encode_ms"]["p99"]:>8.2f} {r["wrap_ms"]["p50"]:>9.2f} {r["wrap_ms"]["p99"]:>9.2f} {1000. / total_ms if total_ms > 0 else 0:>7.1f}')
+
+
+def main():
+    bench_args = _parse_args()
+    results = run(bench_args)
+    report = {'created_at': time.time(), 'platform': platform.platform(), 'python': platform.python_version(), 'opencv': cv2.__version__,
+              'settings': vars(bench_args), 'results': results}
+    with open(bench_args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'results have been written to {bench_args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# end-to-end benchmark of the reader pipeline (capture, encode, publish) against local video files.
+# the cameras are run by the real capture loop (source_reader._capture) in forked reader processes, only the source is replaced by
+# a video file which is paced to its own frame rate and looped, so a file behaves like a live camera. The frames are published to a
+# throwaway redis server and a subscriber measures the capture-to-delivery latency from the timestamps of the binary envelopes.
+#
+#   python -m bench.pipeline_bench --video /path/to/a.mp4 --cameras 1 10 50 200 --output pipeline_bench.json
+#
+# a redis-server binary is always started on a free port and it is thrown away afterwards, the bench writes the same keys as the service
+# and flushes the rq database between the runs, so it never runs against an existing redis.
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from typing import List
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='end-to-end reader pipeline benchmark')
+    parser.add_argument('--video', nargs='+', required=True, help='local video files, the cameras use them round-robin')
+    parser.add_argument('--cameras', nargs='+', type=int, default=[1, 10, 50, 200])
+    parser.add_argument('--cameras-per-process', type=int, default=10)
+    parser.add_argument('--fps', type=int, default=1, help='snapshot frame rate of a camera')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=360)
+    parser.add_argument('--warmup', type=float, default=10.)
+    parser.add_argument('--duration', type=float, default=30.)
+    parser.add_argument('--output', default='pipeline_bench.json')
+    return parser.parse_args()
+
+
+def _get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_redis_server(port: int) -> subprocess.Popen:
+    if shutil.which('redis-server') is None:
+        raise RuntimeError('redis-server could not be found, the bench needs it to start a throwaway redis')
+    proc = subprocess.Popen(['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    for _ in range(50):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=.1):
+                return proc
+        except OSError:
+            time.sleep(.1)
+    proc.kill()
+    raise RuntimeError('redis-server could not be started')
+
+
+def _get_git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], stderr=subprocess.DEVNULL).decode().strip()
+    except BaseException:
+        return ''
+
+
+def main():
+    bench_args = _parse_args()
+    port = _get_free_port()
+    redis_server = _start_redis_server(port)
+    # the service reads the redis address while it is being imported and parses sys.argv for it
+    os.environ['REDIS_HOST'] = '127.0.0.1'
+    os.environ['REDIS_PORT'] = str(port)
+    os.environ['PIPELINE_BENCH_REDIS_PORT'] = str(port)  # the runner refuses to flush any other redis
+    sys.argv = sys.argv[:1]
+    try:
+        from bench.pipeline_runner import run_all
+        results = run_all(bench_args)
+    finally:
+        redis_server.kill()
+    report = {'revision': _get_git_revision(), 'created_at': time.time(), 'platform': platform.platform(), 'python': platform.python_version(),
+              'cpu_count': os.cpu_count(), 'settings': vars(bench_args), 'results': results}
+    with open(bench_args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    _print_table(results)
+    print(f'results have been written to {bench_args.output}')
+
+
+def _print_table(results: List[dict]):
+    header = f'{"cameras":>8} {"procs":>6} {"fps/cam":>8} {"fps":>8} {"cpu%/cam":>9} {"p50 ms":>8} {"p99 ms":>8} {"rss MB":>8} {"dropped":>8}'
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f'{r["cameras"]:>8} {r["processes"]:>6} {r["fps_per_camera"]:>8.2f} {r["fps"]:>8.1f} {r["cpu_percent_per_camera"]:>9.2f} '
+              f'{r["latency_p50_ms"]:>8.1f} {r["latency_p99_ms"]:>8.1f} {r["rss_mb"]:>8.1f} {r["dropped"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
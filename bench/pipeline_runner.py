@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import threading
+import time
+from functools import partial
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from common.config import config_redis
+from common.utilities import logger, config, crate_redis_connection, RedisDb
+from core import source_reader
+from core.frame_envelope import decode_envelope
+from core.metrics import get_rss
+from core.reader_args import ReaderArgs
+from core.reader_engine import ReaderEngine
+from core.sources import SourceBase
+
+# the readers are forked from the bench process like they are forked from the service
+_context = multiprocessing.get_context('fork')
+_COUNTERS = ('grabbed', 'decoded', 'published', 'dropped')
+
+
+# plays a video file at its own frame rate and starts over at the end of it, so it behaves like a live camera instead of being decoded
+# as fast as possible
+class PacedVideoSource(SourceBase):
+    def __init__(self, path: str):
+        self.path = path
+        self.cam = cv2.VideoCapture(path)
+        fps = self.cam.get(cv2.CAP_PROP_FPS)
+        self.interval = 1. / (fps if 0 < fps < 1000 else 25.)
+        self.next_at = time.time()
+        self.grabbed_count: int = 0
+        self.decoded_count: int = 0
+
+    def grab(self) -> bool:
+        delay = self.next_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        # a late frame does not make the next ones burst
+        self.next_at = max(self.next_at, time.time() - self.interval) + self.interval
+        if not self.cam.grab():
+            self.cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            if not self.cam.grab():
+                return False
+        self.grabbed_count += 1
+        return True
+
+    def retrieve(self) -> np.array:
+        succeed, numpy_img = self.cam.retrieve()
+        if not succeed:
+            return None
+        self.decoded_count += 1
+        return numpy_img
+
+    def get_img(self) -> np.array:
+        return self.retrieve() if self.grab() else None
+
+    def is_closed(self) -> bool:
+        return not self.cam.isOpened()
+
+    def close(self):
+        self.cam.release()
+
+
+def _create_source(args: ReaderArgs) -> SourceBase:
+    return PacedVideoSource(args.rtsp_address)
+
+
+def _on_failed(args: ReaderArgs, ex: BaseException, ran_for: float) -> float:
+    return 1.
+
+
+def _sleep_until(timestamp: float):
+    delay = timestamp - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _snapshot(args_list: List[ReaderArgs]) -> Dict[str, float]:
+    snapshot = {counter: 0 for counter in _COUNTERS}
+    for args in args_list:
+        metrics = source_reader._metrics.find(args.identifier)
+        if metrics is not None:
+            for counter in _COUNTERS:
+                snapshot[counter] += getattr(metrics, f'{counter}_count')
+    times = os.times()
+    snapshot['cpu'] = times.user + times.system
+    return snapshot
+
+
+def _run_worker(args_list: List[ReaderArgs], measure_from: float, measure_to: float, result_conn):
+    engine = ReaderEngine(partial(source_reader._capture, create_source=_create_source), _on_failed)
+    for args in args_list:
+        engine.start(args)
+    _sleep_until(measure_from)
+    before = _snapshot(args_list)
+    _sleep_until(measure_to)
+    after = _snapshot(args_list)
+    result = {key: after[key] - before[key] for key in after}
+    result['rss'] = get_rss()
+    # send() is synchronous unlike Queue.put(), whose feeder thread would be killed by os._exit() before the result has been written
+    result_conn.send(result)
+    result_conn.close()
+    os._exit(0)  # the camera threads do not stop by themselves
+
+
+# measures the delay between the capture of a frame (the timestamp in its envelope) and its delivery to a subscriber
+class _LatencySubscriber(threading.Thread):
+    def __init__(self, channel: str, measure_from: float, measure_to: float):
+        super().__init__()
+        self.daemon = True
+        self.channel = channel
+        self.measure_from = measure_from
+        self.measure_to = measure_to
+        self.latencies: List[float] = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        pub_sub = crate_redis_connection(RedisDb.EVENTBUS).pubsub()
+        pub_sub.subscribe(self.channel)
+        while not self.stopped.is_set():
+            message = pub_sub.get_message(ignore_subscribe_messages=True, timeout=.5)
+            if message is None:
+                continue
+            now = time.time()
+            if self.measure_from <= now <= self.measure_to:
+                self.latencies.append(now - decode_envelope(message['data']).timestamp)
+        pub_sub.close()
+
+
+def _percentile_ms(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) * 1000. if len(values) > 0 else .0
+
+
+def _create_args_list(bench_args, camera_count: int) -> List[ReaderArgs]:
+    args_list = []
+    for j in range(camera_count):
+        args = ReaderArgs()
+        args.identifier = f'bench{j}'
+        args.name = f'bench camera {j}'
+        args.rtsp_address = bench_args.video[j % len(bench_args.video)]
+        args.fps = bench_args.fps
+        args.width = bench_args.width
+        args.height = bench_args.height
+        args_list.append(args)
+    return args_list
+
+
+def run(bench_args, camera_count: int) -> dict:
+    args_list = _create_args_list(bench_args, camera_count)
+    source_reader._reader_versions.set_all({args.identifier: args.get_version() for args in args_list})
+    cameras_per_process = max(1, bench_args.cameras_per_process)
+    process_count = (camera_count + cameras_per_process - 1) // cameras_per_process
+    measure_from = time.time() + bench_args.warmup
+    measure_to = measure_from + bench_args.duration
+    subscriber = _LatencySubscriber(source_reader._event_bus_binary.channel, measure_from, measure_to)
+    subscriber.start()
+    procs, conns = [], []
+    for j in range(0, camera_count, cameras_per_process):
+        receiver, sender = _context.Pipe(duplex=False)
+        proc = _context.Process(target=_run_worker, args=(args_list[j:j + cameras_per_process], measure_from, measure_to, sender))
+        proc.start()
+        sender.close()
+        procs.append(proc)
+        conns.append(receiver)
+    worker_results = []
+    for conn in conns:
+        if not conn.poll(max(measure_to - time.time(), 0) + 60.):
+            raise RuntimeError('a bench worker has not reported its result')
+        worker_results.append(conn.recv())
+        conn.close()
+    for proc in procs:
+        proc.join(10)
+    subscriber.stopped.set()
+    subscriber.join(5)
+    # the redis-server has been started by the bench, see pipeline_bench
+    crate_redis_connection(RedisDb.RQ2).flushdb()
+
+    totals = {key: sum(result[key] for result in worker_results) for key in worker_results[0]}
+    fps = totals['published'] / bench_args.duration
+    return {'cameras': camera_count, 'processes': process_count, 'fps': fps, 'fps_per_camera': fps / camera_count,
+            'grabbed': totals['grabbed'], 'decoded': totals['decoded'], 'published': totals['published'], 'dropped': totals['dropped'],
+            'delivered': len(subscriber.latencies),
+            'cpu_percent_per_camera': totals['cpu'] / bench_args.duration / camera_count * 100.,
+            'latency_p50_ms': _percentile_ms(subscriber.latencies, 50), 'latency_p99_ms': _percentile_ms(subscriber.latencies, 99),
+            'rss_mb': totals['rss'] / 2 ** 20, 'rss_mb_per_camera': totals['rss'] / 2 ** 20 / camera_count}
+
+
+def run_all(bench_args) -> List[dict]:
+    if os.environ.get('PIPELINE_BENCH_REDIS_PORT') != str(config_redis.port):
+        raise RuntimeError('the bench flushes redis, it runs only against the redis-server started by bench.pipeline_bench')
+    # the latency is measured on the binary envelopes, the json output is kept as it is configured since it is a part of the cost
+    config.source_reader.publish_binary = True
+    results = []
+    for camera_count in bench_args.cameras:
+        logger.warning(f'benchmarking {camera_count} camera(s)')
+        results.append(run(bench_args, camera_count))
+    return results
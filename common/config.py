@@ -9,18 +9,24 @@ from redis import Redis
 from enum import IntEnum
 import platform
 
+from common.redis_pool import RedisPoolRegistry
+
 
 # it is readonly, but it is shown on redis as information
 class ConfigRedis:
     def __init__(self):
         self.host: str = '127.0.0.1'
         self.port: int = 6379
+        self.max_connections: int = 0  # per database of a process, 0 sizes it by the cameras per process
+        self.pool_timeout: float = 20.  # seconds to wait for a free connection when a pool has been exhausted
         self.__init_values()
 
     def __init_values(self):
         parser = argparse.ArgumentParser()
         parser.add_argument('--redis-host')
         parser.add_argument('--redis-port')
+        parser.add_argument('--redis-max-connections')
+        parser.add_argument('--redis-pool-timeout')
         args = parser.parse_args()
 
         self.host: str = ''
@@ -44,8 +50,28 @@ class ConfigRedis:
             self.port = 6379
         print(f'Redis port: {self.port}')
 
+        emc = os.getenv('REDIS_MAX_CONNECTIONS', '')
+        if len(emc) > 0:
+            self.max_connections = int(emc)
+        elif args.redis_max_connections is not None and len(args.redis_max_connections) > 0:
+            self.max_connections = int(args.redis_max_connections)
+
+        ept = os.getenv('REDIS_POOL_TIMEOUT', '')
+        if len(ept) > 0:
+            self.pool_timeout = float(ept)
+        elif args.redis_pool_timeout is not None and len(args.redis_pool_timeout) > 0:
+            self.pool_timeout = float(args.redis_pool_timeout)
+
+    # the readers, the publisher workers, the long-lived pub/sub and BLPOP connections of a process scale with its cameras
+    def get_max_connections(self, cameras_per_process: int) -> int:
+        if self.max_connections > 0:
+            return self.max_connections
+        return 32 + 4 * max(1, cameras_per_process)
+
 
 config_redis = ConfigRedis()
+# the config is loaded from redis, so the pools are resized by utilities once the cameras per process are known
+redis_pools = RedisPoolRegistry(config_redis.get_max_connections(1), config_redis.pool_timeout)
 
 
 class DbType(IntEnum):
@@ -113,6 +139,56 @@ class SourceReaderConfig:
         self.buffer_size: int = 2
         self.max_retry: int = 150
         self.max_retry_in: int = 6  # hours
+        self.reconnect_base_delay: float = 5.  # seconds, doubled by every consecutive failure
+        self.reconnect_max_delay: float = 300.
+        self.reconnect_stable_after: float = 60.  # a camera which has run that long before failing starts the backoff over
+        self.grab_only: bool = False  # frames which are not going to be published are grabbed but not decoded
+        self.stats_interval: int = 60  # seconds
+        self.cameras_per_process: int = 1  # more than one runs the cameras as threads in the same process
+        self.reader_pool_size: int = 0  # pre-forked reader processes, 0 starts an rq worker process per job instead
+        self.publish_json: bool = True  # base64 json on the read_service channel
+        self.publish_binary: bool = False  # binary frame envelope on the read_service_binary channel
+        self.shm_enabled: bool = False  # raw frames in a shared memory ring, notified on the read_service_shm channel
+        self.shm_slot_count: int = 4
+        self.streams_enabled: bool = False  # encoded frames are added to the read_service_stream:<camera id> redis streams
+        self.streams_max_len: int = 100  # approximate, per stream, 0 means the streams are not trimmed
+        self.streams_shard_count: int = 0  # spreads the cameras over read_service_stream:shard:<n> streams instead of one stream per camera
+        self.batch_enabled: bool = False  # binary frame envelopes of all cameras of a reader process are batched on the read_service_batch channel
+        self.batch_max_size: int = 16  # up to 65535
+        self.batch_window_ms: int = 50  # the longest a frame waits for the batch to be filled
+        self.publisher_pool_size: int = 2
+        self.publisher_queue_size: int = 100
+        self.publisher_overflow_policy: int = 0  # 0: drop oldest of the same camera, 1: drop newest, 2: block
+        self.publisher_coalesce_window_ms: int = 0  # how long a publisher waits for more messages to send them in one pipeline, 0 sends the queued ones only
+        self.publisher_max_batch_size: int = 64
+        self.encoder_pool_enabled: bool = True
+        self.encoder_pool_size: int = 0  # per reader process, 0 means one per camera of the process up to the number of available cores
+        self.ffmpeg_pipe_enabled: bool = False  # decodes by an ffmpeg process which scales the frames to the snapshot size
+        self.ffmpeg_pipe_threads: int = 1  # 0 lets ffmpeg decide
+        self.ffmpeg_pipe_lowres: int = 0  # decodes at 1/2^lowres resolution, only some decoders (i.e. mjpeg) support it
+        self.ffmpeg_pipe_timeout: float = 10.  # seconds, the input timeout of ffmpeg and the longest a frame is waited for
+        self.latest_frame_enabled: bool = False  # a grabber thread drains the stream, so a published frame can not be older than a frame or two
+        self.latest_frame_decode_all: bool = False  # decodes every frame on the grabber thread instead of the asked ones only
+        self.motion_gate_enabled: bool = False  # publishes only the changed frames by the md_* settings of the stream
+        self.motion_gate_max_silence: int = 60  # seconds
+        self.supervisor_reconcile_interval: int = 300  # seconds
+        self.hot_reload_enabled: bool = True  # applies the stream changes without restarting the other readers
+        self.hot_reload_interval: int = 30  # seconds, the streams are compared at least this often
+        self.hot_reload_check_interval: int = 2  # seconds, how often a reader checks whether it is still current
+        self.hot_reload_restart_timeout: float = 120.  # seconds to wait for the previous reader to exit, i.e. if its process has died
+        self.bring_up_concurrency: int = 8  # how many cameras can be opened at the same time
+        self.bring_up_lease: float = 120.  # seconds, a slot which has not been released (i.e. by a killed process) is reclaimed after it
+        self.worker_start_interval: float = 0  # seconds between starting the worker processes, the bring-up slots limit the opening already
+        self.metrics_enabled: bool = True  # prometheus text format on http://metrics_host:metrics_port/metrics
+        self.metrics_host: str = '127.0.0.1'
+        self.metrics_port: int = 9108
+        self.metrics_flush_interval: int = 10  # seconds, how often the reader processes write their statistics to redis
+        self.profiler_enabled: bool = False  # samples the read, encode, serialize and publish timings of one frame in profiler_sample_every
+        self.profiler_sample_every: int = 100
+        self.profiler_flush_interval: int = 30  # seconds, the summaries are written to the profile:<camera id> hashes
+        self.profiler_commands_enabled: bool = False  # 'HSET profile_requests <camera id> <seconds>' captures a cProfile of the camera's reader
+        self.profiler_command_check_interval: float = 2.  # seconds
+        self.profiler_max_capture_duration: float = 300.  # seconds
 
 
 class GeneralConfig:
@@ -234,7 +310,13 @@ class Config:
         config_json = obj.__get_connection().get(obj.__get_redis_key())
         if config_json is not None:
             simple_namespace = json.loads(config_json, object_hook=lambda d: SimpleNamespace(**d))
-            obj.__dict__.update(simple_namespace.__dict__)
+            for key, value in simple_namespace.__dict__.items():
+                section = obj.__dict__.get(key)
+                # merges the saved section into the default one, so newly added fields keep their default values
+                if isinstance(value, SimpleNamespace) and section is not None and hasattr(section, '__dict__'):
+                    section.__dict__.update(value.__dict__)
+                else:
+                    obj.__dict__[key] = value
         return obj
 
     def to_json(self):
@@ -246,8 +328,7 @@ class Config:
 
     def __get_connection(self) -> Redis:
         if self.__connection is None:
-            self.__connection = Redis(host=config_redis.host, port=config_redis.port, charset='utf-8', db=0,
-                                      decode_responses=True)
+            self.__connection = redis_pools.create_connection(config_redis.host, config_redis.port, 0, True)
         return self.__connection
 
     def save(self):
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Iterator, List
 from redis import Redis
 
 from common.data.redis_mapper import RedisMapper
@@ -9,6 +9,7 @@ class BaseRepository:
         self.connection: Redis = connection
         self.namespace: str = namespace
         self._encoding = 'utf-8'
+        self.scan_count = 1000
 
     @staticmethod
     def from_redis(model: Any, redis_binary_dic: dict):
@@ -17,3 +18,32 @@ class BaseRepository:
     @staticmethod
     def to_redis(model: Any) -> dict:
         return RedisMapper(model).to_redis()
+
+    # SCAN does not block the server like KEYS does, but it can return a key more than once, so the duplicates are dropped in order
+    def _scan_keys(self) -> List[bytes]:
+        return list(dict.fromkeys(self.connection.scan_iter(self.namespace + '*', count=self.scan_count)))
+
+    # one round-trip for all keys instead of one per key, the keys which have been deleted meanwhile are skipped
+    def _hgetall_many(self, keys: List[bytes]) -> List[dict]:
+        if len(keys) == 0:
+            return []
+        pipe = self.connection.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [dic for dic in pipe.execute() if dic]
+
+    def _get_all_hashes(self) -> List[dict]:
+        return self._hgetall_many(self._scan_keys())
+
+    # streams the hashes page by page for very large installs, every page costs a SCAN and a pipelined HGETALL round-trip
+    def _iter_all_hashes(self) -> Iterator[dict]:
+        cursor = 0
+        seen = set()
+        while True:
+            cursor, keys = self.connection.scan(cursor, match=self.namespace + '*', count=self.scan_count)
+            keys = [key for key in dict.fromkeys(keys) if key not in seen]
+            seen.update(keys)
+            for dic in self._hgetall_many(keys):
+                yield dic
+            if cursor == 0:
+                break
@@ -491,6 +491,22 @@ class MotionDetectionType(IntEnum):
     Psnr = 3
 
 
+class ChromaSubsampling(IntEnum):
+    Auto = 0
+    S444 = 1
+    S422 = 2
+    S420 = 3
+    S411 = 4
+
+
+class SnapshotEncoder(IntEnum):
+    Jpeg = 0  # libjpeg-turbo if it is installed, OpenCV otherwise
+    OpenCVJpeg = 1
+    TurboJpeg = 2
+    WebP = 3
+    Png = 4  # lossless
+
+
 class SourceModel(FFmpegModel):
     def __init__(self, identifier: str = '', brand: str = '', name: str = '', address: str = ''):
         super().__init__(identifier, address)
@@ -509,6 +525,13 @@ class SourceModel(FFmpegModel):
         self.snapshot_frame_rate: int = 1
         self.snapshot_width: int = 640
         self.snapshot_height: int = 360
+        self.snapshot_quality: int = 95
+        self.snapshot_progressive: bool = False
+        self.snapshot_optimize: bool = False
+        self.snapshot_chroma_subsampling: ChromaSubsampling = ChromaSubsampling.Auto
+        self.snapshot_byte_budget: int = 0  # adapts the quality frame by frame to fit in, zero disables it
+        self.snapshot_encoder: SnapshotEncoder = SnapshotEncoder.Jpeg
+        self.snapshot_png_compression: int = 1  # 0-9, higher is smaller but slower
         self.md_type: MotionDetectionType = MotionDetectionType.OpenCV
         self.md_opencv_threshold: int = 30
         self.md_contour_area_limit: int = 10000
@@ -1,7 +1,22 @@
+import time
+import zlib
 from threading import Thread
+from typing import List
+
+from redis import ResponseError
 
 from common.event_bus.event_handler import EventHandler
-from common.utilities import crate_redis_connection, RedisDb
+from common.event_bus.publisher_pool import PublisherPool, OverflowPolicy, MessageKind
+from common.utilities import logger, crate_redis_connection, RedisDb, config
+
+# shared by all event buses of a process
+_publisher_pool = PublisherPool(config.source_reader.publisher_pool_size, config.source_reader.publisher_queue_size,
+                                OverflowPolicy(config.source_reader.publisher_overflow_policy), config.source_reader.publisher_coalesce_window_ms,
+                                config.source_reader.publisher_max_batch_size)
+
+
+def get_publisher_pool() -> PublisherPool:
+    return _publisher_pool
 
 
 class EventBus:
@@ -12,10 +27,9 @@ class EventBus:
     def publish(self, event):  # added for AI service
         self.connection.publish(self.channel, event)
 
-    def publish_async(self, event):
-        th = Thread(target=self.connection.publish, args=[self.channel, event])
-        th.daemon = True
-        th.start()
+    # the key (i.e. camera id) is used by the drop-oldest overflow policy
+    def publish_async(self, event, key: str = '') -> bool:
+        return _publisher_pool.submit(self.connection, self.channel, event, key)
 
     def subscribe_async(self, event_handler: EventHandler):
         pub_sub = self.connection.pubsub()
@@ -28,3 +42,79 @@ class EventBus:
     def unsubscribe(self):
         pub_sub = self.connection.pubsub()
         pub_sub.unsubscribe(self.channel)
+
+    # redis streams are the alternative to pub/sub: the messages are kept (up to max_len) until they are read, so a slow or restarting
+    # consumer does not miss them, and a consumer group spreads them over the consumers without duplicate work.
+    # a stream is per key (camera) or, if shard_count is set, per shard of the keys
+    def get_stream_name(self, key: str, shard_count: int = 0) -> str:
+        if shard_count > 0:
+            return f'{self.channel}:shard:{zlib.crc32(key.encode("utf-8")) % shard_count}'
+        return f'{self.channel}:{key}'
+
+    def get_stream_names(self) -> List[str]:
+        return [name.decode('utf-8') for name in self.connection.scan_iter(f'{self.channel}:*', count=1000, _type='STREAM')]
+
+    # MAXLEN ~ trims whole macro nodes of the stream, which is much cheaper than the exact trimming
+    def add(self, fields: dict, key: str, max_len: int, shard_count: int = 0):
+        return self.connection.xadd(self.get_stream_name(key, shard_count), fields, maxlen=max_len if max_len > 0 else None, approximate=True)
+
+    def add_async(self, fields: dict, key: str, max_len: int, shard_count: int = 0) -> bool:
+        return _publisher_pool.submit(self.connection, self.get_stream_name(key, shard_count), fields, key, MessageKind.Stream, max_len)
+
+    def create_group(self, stream: str, group: str, start_id: str = '$'):
+        try:
+            self.connection.xgroup_create(stream, group, id=start_id, mkstream=True)
+        except ResponseError as ex:
+            if 'BUSYGROUP' not in str(ex):
+                raise
+
+    # handles the messages of the streams as a member of the consumer group, a message is acknowledged after it has been handled (or failed).
+    # the event has the shape of a pub/sub message: {'type': 'stream', 'channel': stream, 'id': message id, 'data': fields}.
+    # unlike subscribe_async, the messages are handled one by one, so a consumer takes only as many messages as it can handle.
+    # after a restart, the consumer (with the same name) handles its unacknowledged messages first, and the messages of a consumer
+    # which has died are claimed after they have been idle for claim_idle_ms
+    def consume_group(self, event_handler: EventHandler, group: str, consumer: str, streams: List[str], count: int = 10, block_ms: int = 1000,
+                      claim_idle_ms: int = 60000):
+        for stream in streams:
+            self.create_group(stream, group)
+        self.__handle_pending(event_handler, group, consumer, streams, count)
+        prev_claim = time.time()
+        while True:
+            if claim_idle_ms > 0 and time.time() - prev_claim > claim_idle_ms / 1000.:
+                prev_claim = time.time()
+                self.__claim_idle(event_handler, group, consumer, streams, count, claim_idle_ms)
+            response = self.connection.xreadgroup(group, consumer, {stream: '>' for stream in streams}, count=count, block=block_ms)
+            for stream, messages in response or []:
+                self.__handle(event_handler, group, stream, messages)
+
+    def __handle_pending(self, event_handler: EventHandler, group: str, consumer: str, streams: List[str], count: int):
+        last_ids = {stream: '0' for stream in streams}
+        while len(last_ids) > 0:
+            response = self.connection.xreadgroup(group, consumer, last_ids, count=count)
+            handled = set()
+            for stream, messages in response or []:
+                stream = stream.decode('utf-8') if isinstance(stream, bytes) else stream
+                if len(messages) > 0:
+                    self.__handle(event_handler, group, stream, messages)
+                    last_ids[stream] = messages[-1][0]
+                    handled.add(stream)
+            last_ids = {stream: last_id for stream, last_id in last_ids.items() if stream in handled}
+
+    def __claim_idle(self, event_handler: EventHandler, group: str, consumer: str, streams: List[str], count: int, claim_idle_ms: int):
+        for stream in streams:
+            try:
+                response = self.connection.xautoclaim(stream, group, consumer, claim_idle_ms, count=count)
+                self.__handle(event_handler, group, stream, response[1])
+            except BaseException as ex:
+                logger.error(f'an error occurred while claiming the idle messages of {stream}, err: {ex}')
+
+    def __handle(self, event_handler: EventHandler, group: str, stream, messages: list):
+        for message_id, fields in messages:
+            if fields is None:  # it has been trimmed meanwhile
+                self.connection.xack(stream, group, message_id)
+                continue
+            try:
+                event_handler.handle({'type': 'stream', 'channel': stream, 'id': message_id, 'data': fields})
+            except BaseException as ex:
+                logger.error(f'an error occurred while handling the message {message_id} of {stream}, err: {ex}')
+            self.connection.xack(stream, group, message_id)
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List
+
+from redis import Redis
+
+from common.fork_safe import PerProcessStarter
+from common.utilities import logger
+
+
+class OverflowPolicy(IntEnum):
+    DropOldest = 0  # drops the oldest pending message of the same key (camera), or the oldest one if the key has none
+    DropNewest = 1
+    Block = 2
+
+
+class MessageKind(IntEnum):
+    Publish = 0
+    Stream = 1
+
+
+class _PendingMessage:
+    def __init__(self, connection: Redis, channel: str, event: Any, key: str, kind: MessageKind, max_len: int):
+        self.connection = connection
+        self.channel = channel  # the stream of a stream message
+        self.event = event
+        self.key = key
+        self.kind = kind
+        self.max_len = max_len  # 0 means the stream is not trimmed
+        self.submitted_at = time.time()
+
+
+# a fixed number of publisher threads fed by a bounded queue, so the pending messages can not pile up when the broker slows down.
+# a worker sends the messages which are ready within coalesce_window_ms (up to max_batch_size) in one pipeline, so the cameras which are
+# due in the same tick cost one round-trip instead of one per message
+class PublisherPool:
+    def __init__(self, worker_count: int, max_size: int, policy: OverflowPolicy, coalesce_window_ms: int = 0, max_batch_size: int = 1):
+        self.worker_count = max(1, worker_count)
+        self.max_size = max(1, max_size)
+        self.policy = policy
+        self.coalesce_window = max(coalesce_window_ms, 0) / 1000.
+        self.max_batch_size = max(1, max_batch_size)
+        self.queued_count = 0
+        self.dropped_count = 0
+        self.published_count = 0
+        self.failed_count = 0
+        self.batch_count = 0
+        self.batched_count = 0
+        self.coalesce_wait_total = .0  # seconds the first messages of the batches have waited for the others
+        self.observers: List[Callable[[str, float, float], None]] = []
+        self.starter = PerProcessStarter(self.__start_workers)
+        self.__init_state()
+
+    def __init_state(self):
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.items: Deque[_PendingMessage] = deque()
+        self.workers: List[threading.Thread] = []
+
+    # the messages which have been queued by the parent are not published by the child
+    def __start_workers(self):
+        self.__init_state()
+        for _ in range(self.worker_count):
+            th = threading.Thread(target=self.__work)
+            th.daemon = True
+            th.start()
+            self.workers.append(th)
+
+    # an observer receives the key, how long the message has waited in the queue and how long the publishing has taken
+    def add_observer(self, observer: Callable[[str, float, float], None]):
+        self.observers.append(observer)
+
+    # a stream message is added to the stream 'channel' instead of being published, it is trimmed approximately to max_len if it is set
+    def submit(self, connection: Redis, channel: str, event: Any, key: str = '', kind: MessageKind = MessageKind.Publish,
+               max_len: int = 0) -> bool:
+        self.starter.ensure_started()
+        with self.lock:
+            if len(self.items) >= self.max_size:
+                if self.policy == OverflowPolicy.Block:
+                    while len(self.items) >= self.max_size:
+                        self.not_full.wait()
+                elif self.policy == OverflowPolicy.DropNewest:
+                    self.__on_dropped(channel)
+                    return False
+                else:
+                    self.__drop_oldest(key)
+                    self.__on_dropped(channel)
+            self.items.append(_PendingMessage(connection, channel, event, key, kind, max_len))
+            self.queued_count += 1
+            self.not_empty.notify()
+        return True
+
+    def __drop_oldest(self, key: str):
+        for item in self.items:
+            if item.key == key:
+                self.items.remove(item)
+                return
+        self.items.popleft()
+
+    def __on_dropped(self, channel: str):
+        self.dropped_count += 1
+        if self.dropped_count % 100 == 1:
+            logger.warning(f'publisher pool is full, {self.dropped_count} message(s) have been dropped so far, last channel: {channel}')
+
+    def __take_batch(self) -> List[_PendingMessage]:
+        with self.lock:
+            while len(self.items) == 0:
+                self.not_empty.wait()
+            batch = [self.items.popleft()]
+            taken_at = time.time()
+            deadline = taken_at + self.coalesce_window
+            while len(batch) < self.max_batch_size:
+                if len(self.items) > 0:
+                    batch.append(self.items.popleft())
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.not_empty.wait(remaining)
+            self.not_full.notify(len(batch))
+            self.coalesce_wait_total += time.time() - taken_at
+            self.batch_count += 1
+            self.batched_count += len(batch)
+        return batch
+
+    def __work(self):
+        while True:
+            batch = self.__take_batch()
+            # the clients of a database share the connection pool, a pipeline is created per pool
+            groups: Dict[int, List[_PendingMessage]] = {}
+            for item in batch:
+                groups.setdefault(id(item.connection.connection_pool), []).append(item)
+            for items in groups.values():
+                self.__send(items)
+
+    def __send(self, items: List[_PendingMessage]):
+        started_at = time.time()
+        try:
+            pipe = items[0].connection.pipeline(transaction=False)
+            for item in items:
+                if item.kind == MessageKind.Stream:
+                    pipe.xadd(item.channel, item.event, maxlen=item.max_len if item.max_len > 0 else None, approximate=True)
+                else:
+                    pipe.publish(item.channel, item.event)
+            results = pipe.execute(raise_on_error=False)
+        except BaseException as ex:
+            with self.lock:
+                self.failed_count += len(items)
+            logger.error(f'an error occurred while publishing {len(items)} message(s) to {items[0].channel}, err: {ex}')
+            return
+        took = time.time() - started_at
+        failed_count = sum(1 for result in results if isinstance(result, Exception))
+        with self.lock:
+            self.failed_count += failed_count
+            self.published_count += len(items) - failed_count
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.error(f'an error occurred while publishing to {item.channel}, err: {result}')
+                continue
+            for observer in self.observers:
+                observer(item.key, started_at - item.submitted_at, took)
+
+    def get_queue_depth(self) -> int:
+        return len(self.items)
+
+    def get_stats(self) -> dict:
+        mean_batch_size = self.batched_count / self.batch_count if self.batch_count > 0 else .0
+        mean_coalesce_wait = self.coalesce_wait_total / self.batch_count if self.batch_count > 0 else .0
+        return {'queued': self.queued_count, 'dropped': self.dropped_count, 'published': self.published_count, 'failed': self.failed_count,
+                'depth': self.get_queue_depth(), 'batches': self.batch_count, 'mean_batch_size': mean_batch_size,
+                'mean_coalesce_wait': mean_coalesce_wait}
@@ -0,0 +1,29 @@
+import os
+import threading
+from typing import Callable
+
+
+# threads do not survive fork, so the background workers of a process-wide object (i.e. a pool) are started lazily by the process which
+# uses it. start is called once per process, even if several threads use the object for the first time at once. The lock is recreated in
+# the child, since a lock which has been held while forking is never released there
+class PerProcessStarter:
+    def __init__(self, start: Callable[[], None]):
+        self.start = start
+        self.pid = -1
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.__after_fork)
+
+    def __after_fork(self):
+        self.lock = threading.Lock()
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with self.lock:
+            if self.pid != pid:
+                self.start()
+                self.pid = pid
+
+    def is_started(self) -> bool:
+        return self.pid == os.getpid()
@@ -0,0 +1,87 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+
+from redis import BlockingConnectionPool, Redis
+
+
+# keeps its own counters instead of reading the private fields of redis-py, they are reset with the connections after fork
+class _CountingConnectionPool(BlockingConnectionPool):
+    def reset(self):
+        self.counter_lock = threading.Lock()
+        self.created_count = 0
+        self.in_use_count = 0
+        super().reset()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        with self.counter_lock:
+            self.created_count += 1
+        return connection
+
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        with self.counter_lock:
+            self.in_use_count += 1
+        return connection
+
+    def release(self, connection):
+        # a connection of the parent is not given back to the pool of the child
+        if connection.pid == self.pid:
+            with self.counter_lock:
+                self.in_use_count = max(self.in_use_count - 1, 0)
+        super().release(connection)
+
+
+# one connection pool per redis database and connection options for the whole process, so the repositories, the event buses and the config
+# share the connections instead of every client opening its own ones. A pool is limited to max_connections, a caller waits up to timeout
+# seconds for a free connection when it has been exhausted. The pools are fork-safe, redis-py replaces the inherited connections in the child
+# on the first use instead of sharing the sockets of the parent
+class RedisPoolRegistry:
+    def __init__(self, max_connections: int, timeout: float):
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        # the options of the connections are a part of the key, the clients with different ones get pools of their own
+        self.pools: Dict[Tuple[str, int, int, bool, bool, int], _CountingConnectionPool] = {}
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.__after_fork)
+
+    # a lock which has been held while forking is never released in the child
+    def __after_fork(self):
+        self.lock = threading.Lock()
+
+    # the pools which have already been created keep their size
+    def set_max_connections(self, max_connections: int):
+        self.max_connections = max(1, max_connections)
+
+    def get_pool(self, host: str, port: int, db: int, decode_responses: bool = False, socket_keepalive: bool = False,
+                 health_check_interval: int = 0) -> BlockingConnectionPool:
+        key = (host, port, db, decode_responses, socket_keepalive, health_check_interval)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = _CountingConnectionPool(host=host, port=port, db=db, encoding='utf-8', decode_responses=decode_responses,
+                                               socket_keepalive=socket_keepalive, health_check_interval=health_check_interval,
+                                               max_connections=self.max_connections, timeout=self.timeout)
+                self.pools[key] = pool
+            return pool
+
+    def create_connection(self, host: str, port: int, db: int, decode_responses: bool = False, socket_keepalive: bool = False,
+                          health_check_interval: int = 0) -> Redis:
+        return Redis(connection_pool=self.get_pool(host, port, db, decode_responses, socket_keepalive, health_check_interval))
+
+    # the connections of the current process, the ones inherited from the parent are not counted until they have been replaced
+    def get_stats(self) -> List[dict]:
+        with self.lock:
+            pools = list(self.pools.items())
+        stats = []
+        for (host, port, db, decode_responses, _, _), pool in pools:
+            current = pool.pid == os.getpid()
+            created = pool.created_count if current else 0
+            in_use = pool.in_use_count if current else 0
+            stats.append({'host': host, 'port': port, 'db': db, 'decode_responses': decode_responses, 'created': created, 'in_use': in_use,
+                          'idle': max(created - in_use, 0), 'max': pool.max_connections})
+        return stats
+
+    def get_connection_count(self) -> int:
+        return sum(dic['created'] for dic in self.get_stats())
@@ -3,13 +3,14 @@ from redis import Redis
 from enum import IntEnum
 from datetime import datetime
 
-from common.config import Config, config_redis
+from common.config import Config, config_redis, redis_pools
 
 logger = logging.getLogger('logger')
 logger.setLevel(logging.WARNING)
 logging.basicConfig(level=logging.WARNING)
 
 config: Config = Config.create()
+redis_pools.set_max_connections(config_redis.get_max_connections(config.source_reader.cameras_per_process))
 
 
 class RedisDb(IntEnum):
@@ -19,9 +20,9 @@ class RedisDb(IntEnum):
     EVENTBUS = 15
 
 
+# the clients of a database share the connection pool of the process
 def crate_redis_connection(db: RedisDb, socket_keepalive: bool = False, health_check_interval: int = 0) -> Redis:
-    return Redis(host=config_redis.host, port=config_redis.port, charset='utf-8', db=int(db), socket_keepalive=socket_keepalive,
-                 health_check_interval=health_check_interval)
+    return redis_pools.create_connection(config_redis.host, config_redis.port, int(db), False, socket_keepalive, health_check_interval)
 
 
 def fix_zero_s(val_str: str) -> str:
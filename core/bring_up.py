@@ -0,0 +1,82 @@
+import time
+from typing import Callable
+
+from common.utilities import logger
+from core.data.bring_up_repository import BringUp, BringUpRepository, BringUpSlots
+from core.reader_args import ReaderArgs
+
+
+# limits how many cameras are opened at the same time across the reader processes and reports their time-to-first-frame.
+# a slot is held from the opening of the capture until the first frame, which is the expensive part (RTSP handshake, probing)
+class BringUpTracker:
+    def __init__(self, args: ReaderArgs, slots: BringUpSlots, repository: BringUpRepository, is_current: Callable[[], bool] = None,
+                 check_interval: float = 2., poll_interval: float = .2, log_interval: float = 30.):
+        self.args = args
+        self.slots = slots
+        self.repository = repository
+        self.is_current = is_current
+        self.check_interval = check_interval
+        self.poll_interval = poll_interval
+        self.log_interval = log_interval
+        self.model = BringUp(args.identifier, args.name)
+        self.token: str | None = None
+        self.completed = False
+
+    # returns False if the camera has been removed or reconfigured while it has been waiting for a slot
+    def begin(self) -> bool:
+        self.model.started_at = time.time()
+        if self.slots is not None:
+            self.token = self.__acquire()
+            if self.token is None and self.__is_cancelled():
+                return False
+        self.model.wait_time = time.time() - self.model.started_at
+        return True
+
+    def __is_cancelled(self) -> bool:
+        return self.is_current is not None and not self.is_current()
+
+    # waits as long as it takes, the slots of the killed processes expire, so the cap holds without a deadline.
+    # the cameras are not held back by a broker failure, they are opened without a slot instead
+    def __acquire(self) -> str:
+        logged_at = checked_at = self.model.started_at
+        while True:
+            try:
+                token = self.slots.try_acquire()
+            except BaseException as ex:
+                logger.error(f'camera ({self.args.name}) is being opened without a bring-up slot, since acquiring it has failed, err: {ex}')
+                return None
+            if token is not None:
+                return token
+            if time.time() - checked_at >= self.check_interval:
+                checked_at = time.time()
+                if self.__is_cancelled():
+                    logger.warning(f'camera ({self.args.name}) has stopped waiting for a bring-up slot, since it is no longer current')
+                    return None
+            if time.time() - logged_at >= self.log_interval:
+                logged_at = time.time()
+                logger.warning(f'camera ({self.args.name}) has been waiting for a bring-up slot for {logged_at - self.model.started_at:.0f}s')
+            time.sleep(self.poll_interval)
+
+    def on_opened(self):
+        self.model.open_time = time.time() - self.model.started_at - self.model.wait_time
+
+    def on_first_frame(self):
+        if self.completed:
+            return
+        self.model.first_frame_time = time.time() - self.model.started_at
+        self.end()
+        logger.warning(f'camera ({self.args.name}) is up, time to first frame: {self.model.first_frame_time:.2f}s '
+                       f'(waited: {self.model.wait_time:.2f}s, opened in: {self.model.open_time:.2f}s)')
+        try:
+            self.repository.add(self.model)
+        except BaseException as ex:
+            logger.error(f'an error occurred while saving the bring-up of camera ({self.args.name}), err: {ex}')
+
+    def end(self):
+        self.completed = True
+        if self.token is not None:
+            token, self.token = self.token, None
+            try:
+                self.slots.release(token)
+            except BaseException as ex:
+                logger.error(f'an error occurred while releasing the bring-up slot of camera ({self.args.name}), err: {ex}')
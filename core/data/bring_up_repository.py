@@ -0,0 +1,57 @@
+import time
+import uuid
+from typing import List
+from redis import Redis
+
+from common.data.base_repository import BaseRepository
+
+
+class BringUp:
+    def __init__(self, identifier: str = '', name: str = ''):
+        self.id: str = identifier
+        self.name: str = name
+        self.started_at: float = .0
+        self.wait_time: float = .0  # waited for a bring-up slot
+        self.open_time: float = .0  # opening the capture
+        self.first_frame_time: float = .0  # from the start to the first decoded frame
+
+
+class BringUpRepository(BaseRepository):
+    def __init__(self, connection: Redis):
+        super().__init__(connection, 'bring_up:')
+
+    def add(self, model: BringUp):
+        self.connection.hset(f'{self.namespace}{model.id}', mapping=self.to_redis(model))
+
+    def get_all(self) -> List[BringUp]:
+        return [self.from_redis(BringUp(), dic) for dic in self._get_all_hashes()]
+
+
+# the bring-up slots shared by all reader processes, a slot is a lease which expires, so the slot of a killed process is reclaimed
+# instead of being held forever. A sorted set of the slot tokens scored by their expiry
+class BringUpSlots:
+    _ACQUIRE = """
+        redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+        if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+            redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+            return 1
+        end
+        return 0
+    """
+
+    def __init__(self, connection: Redis, limit: int, lease: float):
+        self.connection: Redis = connection
+        self.key = 'bring_up_slots'
+        self.limit = max(1, limit)
+        self.lease = lease  # seconds, longer than a bring-up normally takes
+        self.acquire_script = connection.register_script(self._ACQUIRE)
+
+    # returns the token of the slot or None if there is no free one
+    def try_acquire(self) -> str:
+        token = uuid.uuid4().hex
+        now = time.time()
+        acquired = self.acquire_script(keys=[self.key], args=[self.limit, now, now + self.lease, token])
+        return token if acquired == 1 else None
+
+    def release(self, token: str):
+        self.connection.zrem(self.key, token)
@@ -1,5 +1,7 @@
 from redis import Redis
-from typing import List
+from typing import Iterator, List
+
+from common.data.base_repository import BaseRepository
 
 
 class Jober:
@@ -12,10 +14,11 @@ class Jober:
         self.exception_msg = ''
 
 
-class JoberRepository:
+class JoberRepository(BaseRepository):
     def __init__(self, connection: Redis):
-        self.namespace = 'jober:'
-        self.connection: Redis = connection
+        super().__init__(connection, 'jober:')
+        # the ids of the failed jobs are pushed here, so the supervisor can wait on it instead of polling the keys
+        self.failed_list_key = 'jober_failed'
 
     def _get_key(self, model: Jober):
         key = model.job_id
@@ -24,23 +27,34 @@ class JoberRepository:
     def add(self, model: Jober):
         key = self._get_key(model)
         dic = model.__dict__.copy()
-        self.connection.hset(key, mapping=dic)
+        pipe = self.connection.pipeline()
+        pipe.hset(key, mapping=dic)
+        pipe.rpush(self.failed_list_key, model.job_id)
+        pipe.execute()
+
+    # blocks until a job fails and returns its id, or None if the timeout occurs
+    def wait_failed(self, timeout: int) -> str:
+        result = self.connection.blpop([self.failed_list_key], timeout=timeout)
+        if result is None:
+            return None
+        return result[1].decode('utf-8')
+
+    def get(self, job_id: str) -> Jober:
+        dic = self.connection.hgetall(f'{self.namespace}{job_id}')
+        if not dic:
+            return None
+        return self._from_redis(dic)
+
+    def _from_redis(self, dic: dict) -> Jober:
+        return self.from_redis(Jober(), dic)
 
     def remove(self, model: Jober):
         key = self._get_key(model)
         self.connection.delete(key)
 
     def get_all(self) -> List[Jober]:
-        models: List[Jober] = []
-        keys = self.connection.keys(f'{self.namespace}*')
-        for key in keys:
-            dic = self.connection.hgetall(key)
-            model = Jober()
-            model.starter_pid = dic[b'starter_pid'].decode('utf-8')
-            model.worker_pid = dic[b'worker_pid'].decode('utf-8')
-            model.worker_name = dic[b'worker_name'].decode('utf-8')
-            model.job_id = dic[b'job_id'].decode('utf-8')
-            model.args = dic[b'args'].decode('utf-8')
-            model.exception_msg = dic[b'exception_msg'].decode('utf-8')
-            models.append(model)
-        return models
+        return [self._from_redis(dic) for dic in self._get_all_hashes()]
+
+    def iter_all(self) -> Iterator[Jober]:
+        for dic in self._iter_all_hashes():
+            yield self._from_redis(dic)
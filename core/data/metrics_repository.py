@@ -0,0 +1,40 @@
+from typing import Dict, List
+from redis import Redis
+
+from common.data.base_repository import BaseRepository
+
+
+# the last flushed statistics of the cameras and the reader processes, the values are kept as they are written (numbers and json)
+class MetricsRepository(BaseRepository):
+    def __init__(self, connection: Redis):
+        super().__init__(connection, 'metrics:')
+        self.namespace_process = 'metrics_process:'
+
+    def add_all(self, camera_stats: List[dict]):
+        if len(camera_stats) == 0:
+            return
+        pipe = self.connection.pipeline(transaction=False)
+        for stats in camera_stats:
+            pipe.hset(f'{self.namespace}{stats["id"]}', mapping=stats)
+        pipe.execute()
+
+    def add_process(self, pid: int, stats: dict, ttl: int):
+        key = f'{self.namespace_process}{pid}'
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hset(key, mapping=stats)
+        pipe.expire(key, max(ttl, 1))
+        pipe.execute()
+
+    def remove(self, identifier: str):
+        self.connection.delete(f'{self.namespace}{identifier}')
+
+    @staticmethod
+    def __decode(dic: dict) -> Dict[str, str]:
+        return {k.decode('utf-8'): v.decode('utf-8') for k, v in dic.items()}
+
+    def get_all(self) -> List[Dict[str, str]]:
+        return [self.__decode(dic) for dic in self._get_all_hashes()]
+
+    def get_processes(self) -> List[Dict[str, str]]:
+        keys = list(dict.fromkeys(self.connection.scan_iter(self.namespace_process + '*', count=self.scan_count)))
+        return [self.__decode(dic) for dic in self._hgetall_many(keys)]
@@ -0,0 +1,38 @@
+from typing import Dict
+from redis import Redis
+
+from common.data.base_repository import BaseRepository
+
+
+# the stage timing summaries and the on-demand cProfile captures of the readers.
+# a capture is requested by 'HSET profile_requests <camera id> <seconds>', its report is saved to 'profile_result:<camera id>'
+class ProfileRepository(BaseRepository):
+    def __init__(self, connection: Redis):
+        super().__init__(connection, 'profile:')
+        self.requests_key = 'profile_requests'
+        self.namespace_result = 'profile_result:'
+
+    def add_summaries(self, summaries: Dict[str, dict]):
+        if len(summaries) == 0:
+            return
+        pipe = self.connection.pipeline(transaction=False)
+        for identifier, summary in summaries.items():
+            pipe.hset(f'{self.namespace}{identifier}', mapping=summary)
+        pipe.execute()
+
+    def get_requests(self) -> Dict[str, float]:
+        return {k.decode('utf-8'): float(v) for k, v in self.connection.hgetall(self.requests_key).items()}
+
+    # only one reader gets the request, even if the camera has been moved meanwhile
+    def take_request(self, identifier: str) -> bool:
+        return self.connection.hdel(self.requests_key, identifier) == 1
+
+    def add_request(self, identifier: str, duration: float):
+        self.connection.hset(self.requests_key, identifier, duration)
+
+    def add_result(self, identifier: str, report: str, ttl: int):
+        self.connection.set(f'{self.namespace_result}{identifier}', report, ex=ttl)
+
+    def get_result(self, identifier: str) -> str:
+        value = self.connection.get(f'{self.namespace_result}{identifier}')
+        return value.decode('utf-8') if value is not None else None
@@ -0,0 +1,37 @@
+from typing import Dict
+from redis import Redis
+
+
+# the config version of every camera which should be running, a reader stops itself when its version is no longer the current one
+class ReaderVersionRepository:
+    def __init__(self, connection: Redis):
+        self.key = 'reader_versions'
+        self.running_key = 'reader_running'  # identifier:version of the readers which have not exited yet
+        self.connection: Redis = connection
+
+    def set(self, identifier: str, version: str):
+        self.connection.hset(self.key, identifier, version)
+
+    def set_all(self, versions: Dict[str, str]):
+        if len(versions) > 0:
+            self.connection.hset(self.key, mapping=versions)
+
+    def remove(self, identifier: str):
+        self.connection.hdel(self.key, identifier)
+
+    def get(self, identifier: str) -> str:
+        value = self.connection.hget(self.key, identifier)
+        return value.decode('utf-8') if value is not None else None
+
+    # a reader is marked as running until it has released its resources, so its replacement waits for it instead of overlapping it
+    def set_running(self, identifier: str, version: str):
+        self.connection.sadd(self.running_key, f'{identifier}:{version}')
+
+    def remove_running(self, identifier: str, version: str):
+        self.connection.srem(self.running_key, f'{identifier}:{version}')
+
+    def is_running(self, identifier: str, version: str) -> bool:
+        return bool(self.connection.sismember(self.running_key, f'{identifier}:{version}'))
+
+    def get_all(self) -> Dict[str, str]:
+        return {k.decode('utf-8'): v.decode('utf-8') for k, v in self.connection.hgetall(self.key).items()}
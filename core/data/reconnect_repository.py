@@ -0,0 +1,53 @@
+import uuid
+from typing import List, Tuple
+from redis import Redis
+
+from common.data.base_repository import BaseRepository
+
+
+class ReconnectState:
+    def __init__(self, identifier: str = '', name: str = ''):
+        self.id: str = identifier
+        self.name: str = name
+        self.consecutive_failures: int = 0
+        self.failure_count: int = 0  # all failures since the service has been started
+        self.failures_in_window: int = 0
+        self.last_failed_at: float = .0
+        self.next_retry_at: float = .0
+        self.parked: bool = False  # the retry budget has been exhausted, the camera waits for the window to slide
+
+
+class ReconnectRepository(BaseRepository):
+    def __init__(self, connection: Redis):
+        super().__init__(connection, 'reconnect:')
+        self.namespace_failures = 'reconnect_failures:'
+
+    def _get_key(self, identifier: str) -> str:
+        return f'{self.namespace}{identifier}'
+
+    def add(self, model: ReconnectState):
+        self.connection.hset(self._get_key(model.id), mapping=self.to_redis(model))
+
+    def get(self, identifier: str) -> ReconnectState:
+        dic = self.connection.hgetall(self._get_key(identifier))
+        if not dic:
+            return None
+        return self.from_redis(ReconnectState(), dic)
+
+    def get_all(self) -> List[ReconnectState]:
+        return [self.from_redis(ReconnectState(), dic) for dic in self._get_all_hashes()]
+
+    def remove(self, identifier: str):
+        self.connection.delete(self._get_key(identifier), f'{self.namespace_failures}{identifier}')
+
+    # records a failure into the sliding window and returns the failure count in the window and the time of the oldest one
+    def add_failure(self, identifier: str, timestamp: float, window: float) -> Tuple[int, float]:
+        key = f'{self.namespace_failures}{identifier}'
+        pipe = self.connection.pipeline()
+        pipe.zremrangebyscore(key, 0, timestamp - window)
+        pipe.zadd(key, {uuid.uuid4().hex: timestamp})
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        pipe.expire(key, max(int(window), 1))
+        _, _, count, oldest, _ = pipe.execute()
+        return count, oldest[0][1] if len(oldest) > 0 else timestamp
@@ -0,0 +1,90 @@
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Set, Tuple
+
+from common.fork_safe import PerProcessStarter
+from common.utilities import logger
+
+
+def get_available_cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# encodes and publishes the frames off the capture threads. cv2 releases the GIL while encoding, so the work spreads over the cores.
+# every camera has only one pending frame, a newer one replaces it, and the frames of a camera are never processed concurrently.
+# worker_count 0 sizes the pool by the cameras of the process, since every reader process has a pool of its own and a pool per process
+# with a worker per core would oversubscribe the host
+class EncoderPool:
+    def __init__(self, worker_count: int, camera_count: int = 1):
+        self.worker_count = worker_count if worker_count > 0 else max(1, min(camera_count, get_available_cpu_count()))
+        self.submitted_count = 0
+        self.replaced_count = 0
+        self.starter = PerProcessStarter(self.__start_workers)
+        self.__init_state()
+
+    def __init_state(self):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.pending: Dict[str, Tuple[Callable, Tuple[Any, ...]]] = {}
+        self.ready: Deque[str] = deque()
+        self.running: Set[str] = set()
+        self.workers: List[threading.Thread] = []
+
+    def __start_workers(self):
+        self.__init_state()
+        for _ in range(self.worker_count):
+            th = threading.Thread(target=self.__work)
+            th.daemon = True
+            th.start()
+            self.workers.append(th)
+        logger.info(f'encoder pool has been started with {self.worker_count} worker(s)')
+
+    # returns False if a pending frame of the same key has been replaced, which means it has been dropped
+    def submit(self, key: str, fn: Callable, *args) -> bool:
+        self.starter.ensure_started()
+        with self.lock:
+            self.submitted_count += 1
+            replaced = key in self.pending
+            if replaced:
+                self.replaced_count += 1
+            elif key not in self.running:
+                self.ready.append(key)
+            self.pending[key] = (fn, args)
+            self.changed.notify_all()
+        return not replaced
+
+    # drops the pending frame of the camera and waits for the running one, i.e. before the camera's resources are released
+    def discard(self, key: str):
+        if not self.starter.is_started():
+            return
+        with self.lock:
+            self.pending.pop(key, None)
+            if key in self.ready:
+                self.ready.remove(key)
+            while key in self.running:
+                self.changed.wait()
+
+    def __work(self):
+        while True:
+            with self.lock:
+                while len(self.ready) == 0:
+                    self.changed.wait()
+                key = self.ready.popleft()
+                fn, args = self.pending.pop(key)
+                self.running.add(key)
+            try:
+                fn(*args)
+            except BaseException as ex:
+                logger.error(f'an error occurred while encoding a frame of ({key}), err: {ex}')
+            with self.lock:
+                self.running.discard(key)
+                if key in self.pending:
+                    self.ready.append(key)
+                self.changed.notify_all()
+
+    def get_stats(self) -> dict:
+        return {'workers': self.worker_count, 'submitted': self.submitted_count, 'replaced': self.replaced_count, 'pending': len(self.pending)}
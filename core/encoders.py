@@ -0,0 +1,198 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Any, List
+
+import cv2
+import numpy as np
+
+from common.data.source_model import ChromaSubsampling, SnapshotEncoder
+from common.utilities import logger
+from core.reader_args import ReaderArgs
+
+_MIN_QUALITY = 10
+_MAX_QUALITY = 100
+
+
+def _create_sampling_factors() -> dict:
+    # IMWRITE_JPEG_SAMPLING_FACTOR is available since OpenCV 4.5.5
+    names = {
+        ChromaSubsampling.S444: 'IMWRITE_JPEG_SAMPLING_FACTOR_444',
+        ChromaSubsampling.S422: 'IMWRITE_JPEG_SAMPLING_FACTOR_422',
+        ChromaSubsampling.S420: 'IMWRITE_JPEG_SAMPLING_FACTOR_420',
+        ChromaSubsampling.S411: 'IMWRITE_JPEG_SAMPLING_FACTOR_411'
+    }
+    return {key: getattr(cv2, name) for key, name in names.items() if hasattr(cv2, name)}
+
+
+_sampling_factors = _create_sampling_factors()
+_turbo_jpeg = {'instance': None, 'checked': False}
+
+
+# libjpeg-turbo through PyTurboJPEG is optional, None means it is not installed or the library could not be loaded
+def get_turbo_jpeg():
+    if not _turbo_jpeg['checked']:
+        _turbo_jpeg['checked'] = True
+        try:
+            from turbojpeg import TurboJPEG
+            _turbo_jpeg['instance'] = TurboJPEG()
+        except BaseException as ex:
+            logger.info(f'libjpeg-turbo is not available, OpenCV will be used for jpeg, err: {ex}')
+    return _turbo_jpeg['instance']
+
+
+# encodes the frames of a camera and keeps the timing of the encoding. encode() returns a bytes-like object (bytes or a numpy buffer)
+class EncoderBase(ABC):
+    def __init__(self, name: str, image_format: str):
+        self.name = name
+        self.format = image_format  # it is published with the image, so the consumers know how to decode it
+        self.last_size = 0
+        self.last_encode_time = .0  # seconds
+        self.encode_time_total = .0
+        self.encoded_count = 0
+
+    def encode(self, img: np.array) -> Any:
+        started_at = time.perf_counter()
+        buff = self._encode(img)
+        self.last_encode_time = time.perf_counter() - started_at
+        self.encode_time_total += self.last_encode_time
+        self.encoded_count += 1
+        self.last_size = len(buff)
+        return buff
+
+    @abstractmethod
+    def _encode(self, img: np.array) -> Any:
+        pass
+
+    def get_stats(self) -> dict:
+        mean = self.encode_time_total / self.encoded_count if self.encoded_count > 0 else .0
+        return {'encoder': self.name, 'format': self.format, 'encoded': self.encoded_count, 'mean_encode_time': mean, 'last_size': self.last_size}
+
+
+# a lossy encoder. If a byte budget is set, the quality is adapted frame by frame to keep the payload under the budget
+class QualityEncoderBase(EncoderBase, ABC):
+    def __init__(self, name: str, image_format: str, quality: int, byte_budget: int):
+        super().__init__(name, image_format)
+        self.max_quality = min(max(quality, _MIN_QUALITY), _MAX_QUALITY)
+        self.quality = self.max_quality
+        self.byte_budget = byte_budget
+
+    def encode(self, img: np.array) -> Any:
+        buff = super().encode(img)
+        if self.byte_budget > 0:
+            self.__adapt_quality()
+        return buff
+
+    def __adapt_quality(self):
+        ratio = self.last_size / self.byte_budget
+        if ratio > 1.:
+            # steps down faster than it steps up, exceeding the budget costs more than a slightly lower quality
+            step = min(int((ratio - 1.) * 20.) + 1, 15)
+            self.quality = max(self.quality - step, _MIN_QUALITY)
+        elif ratio < .85:
+            self.quality = min(self.quality + 1, self.max_quality)
+
+
+class JpegEncoder(QualityEncoderBase):
+    def __init__(self, quality: int, progressive: bool, optimize: bool, chroma_subsampling: ChromaSubsampling, byte_budget: int):
+        super().__init__('opencv-jpeg', 'jpeg', quality, byte_budget)
+        self.progressive = progressive
+        self.optimize = optimize
+        self.chroma_subsampling = chroma_subsampling
+        self.fixed_params = self.__create_fixed_params()
+
+    @staticmethod
+    def create(args: ReaderArgs):
+        return JpegEncoder(args.quality, args.progressive, args.optimize, ChromaSubsampling(args.chroma_subsampling), args.byte_budget)
+
+    def __create_fixed_params(self) -> List[int]:
+        params = []
+        if self.progressive:
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+        if self.optimize:
+            params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        if self.chroma_subsampling != ChromaSubsampling.Auto:
+            factor = _sampling_factors.get(self.chroma_subsampling)
+            if factor is not None:
+                params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, factor]
+            else:
+                logger.warning(f'chroma subsampling ({self.chroma_subsampling.name}) is not supported by this OpenCV build, it will be ignored')
+        return params
+
+    def _encode(self, img: np.array) -> Any:
+        succeed, buff = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, self.quality] + self.fixed_params)
+        if not succeed:
+            raise ValueError('the image could not be encoded as jpeg')
+        return buff
+
+
+# libjpeg-turbo through PyTurboJPEG, the optimize option is not supported by it, so it is ignored
+class TurboJpegEncoder(QualityEncoderBase):
+    def __init__(self, turbo_jpeg, quality: int, progressive: bool, chroma_subsampling: ChromaSubsampling, byte_budget: int):
+        super().__init__('turbo-jpeg', 'jpeg', quality, byte_budget)
+        import turbojpeg
+        self.turbo_jpeg = turbo_jpeg
+        self.flags = turbojpeg.TJFLAG_PROGRESSIVE if progressive else 0
+        subsamples = {ChromaSubsampling.S444: turbojpeg.TJSAMP_444, ChromaSubsampling.S422: turbojpeg.TJSAMP_422,
+                      ChromaSubsampling.S420: turbojpeg.TJSAMP_420, ChromaSubsampling.S411: turbojpeg.TJSAMP_411}
+        self.subsample = subsamples.get(chroma_subsampling, turbojpeg.TJSAMP_420)  # 4:2:0 is what OpenCV does by default
+        self.pixel_format = turbojpeg.TJPF_BGR
+
+    def _encode(self, img: np.array) -> Any:
+        return self.turbo_jpeg.encode(img, quality=self.quality, pixel_format=self.pixel_format, jpeg_subsample=self.subsample, flags=self.flags)
+
+
+class WebPEncoder(QualityEncoderBase):
+    def __init__(self, quality: int, byte_budget: int):
+        super().__init__('opencv-webp', 'webp', quality, byte_budget)
+
+    def _encode(self, img: np.array) -> Any:
+        succeed, buff = cv2.imencode('.webp', img, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+        if not succeed:
+            raise ValueError('the image could not be encoded as webp')
+        return buff
+
+
+# lossless, i.e. for the evidence archiving. The byte budget does not apply
+class PngEncoder(EncoderBase):
+    def __init__(self, compression: int):
+        super().__init__('opencv-png', 'png')
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, min(max(compression, 0), 9)]
+
+    def _encode(self, img: np.array) -> Any:
+        succeed, buff = cv2.imencode('.png', img, self.params)
+        if not succeed:
+            raise ValueError('the image could not be encoded as png')
+        return buff
+
+
+# OpenCV can be built without webp, so the backend is tried once before it is used
+def _is_supported(encoder: EncoderBase) -> bool:
+    try:
+        encoder._encode(np.zeros((16, 16, 3), dtype=np.uint8))
+        return True
+    except BaseException as ex:
+        logger.warning(f'{encoder.name} encoder is not supported, err: {ex}')
+        return False
+
+
+# the encoder of the stream's snapshot_encoder. A backend which is not available falls back to the OpenCV jpeg one
+def create_encoder(args: ReaderArgs) -> EncoderBase:
+    encoder_type = SnapshotEncoder(args.encoder)
+    chroma_subsampling = ChromaSubsampling(args.chroma_subsampling)
+    if encoder_type in (SnapshotEncoder.Jpeg, SnapshotEncoder.TurboJpeg):
+        turbo_jpeg = get_turbo_jpeg()
+        if turbo_jpeg is not None:
+            return TurboJpegEncoder(turbo_jpeg, args.quality, args.progressive, chroma_subsampling, args.byte_budget)
+        if encoder_type == SnapshotEncoder.TurboJpeg:
+            logger.warning(f'camera ({args.name}) libjpeg-turbo is not available, OpenCV jpeg encoder will be used instead')
+    elif encoder_type == SnapshotEncoder.WebP:
+        encoder = WebPEncoder(args.quality, args.byte_budget)
+        if _is_supported(encoder):
+            return encoder
+        logger.warning(f'camera ({args.name}) webp is not available, OpenCV jpeg encoder will be used instead')
+    elif encoder_type == SnapshotEncoder.Png:
+        encoder = PngEncoder(args.png_compression)
+        if _is_supported(encoder):
+            return encoder
+        logger.warning(f'camera ({args.name}) png is not available, OpenCV jpeg encoder will be used instead')
+    return JpegEncoder.create(args)
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Callable, List
+
+from common.fork_safe import PerProcessStarter
+from common.utilities import logger
+from core.frame_envelope import MAX_BATCH_SIZE, encode_batch
+
+
+# collects the frame envelopes of all cameras of a reader process and emits them as one batch message when max_size frames have been
+# collected or the oldest one has waited for window_ms, so the batched inference receives ready-made batches with fewer messages
+class FrameBatcher:
+    def __init__(self, emit: Callable[[bytes], bool], max_size: int, window_ms: int):
+        self.emit = emit
+        self.max_size = min(max(1, max_size), MAX_BATCH_SIZE)
+        self.window = max(window_ms, 1) / 1000.
+        self.batch_count = 0
+        self.frame_count = 0
+        self.dropped_count = 0
+        self.starter = PerProcessStarter(self.__start)
+        self.__init_state()
+
+    def __init_state(self):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.envelopes: List[bytes] = []
+        self.first_added_at = .0
+
+    def __start(self):
+        self.__init_state()
+        th = threading.Thread(target=self.__run)
+        th.daemon = True
+        th.start()
+        logger.info(f'frame batcher has been started, max size: {self.max_size}, window: {self.window * 1000.:.0f} ms')
+
+    def add(self, envelope: bytes):
+        self.starter.ensure_started()
+        with self.lock:
+            if len(self.envelopes) == 0:
+                self.first_added_at = time.time()
+                self.changed.notify()
+            self.envelopes.append(envelope)
+            if len(self.envelopes) < self.max_size:
+                return
+            envelopes = self.__take()
+        # a full batch is emitted by the capture thread which has filled it, it does not wait for the window
+        self.__emit(envelopes)
+
+    def __take(self) -> List[bytes]:
+        envelopes = self.envelopes
+        self.envelopes = []
+        return envelopes
+
+    def __emit(self, envelopes: List[bytes]):
+        try:
+            accepted = self.emit(encode_batch(envelopes))
+        except BaseException as ex:
+            logger.error(f'an error occurred while emitting a frame batch, err: {ex}')
+            accepted = False
+        with self.lock:
+            self.batch_count += 1
+            self.frame_count += len(envelopes)
+            if not accepted:
+                self.dropped_count += len(envelopes)
+
+    def __run(self):
+        while True:
+            with self.lock:
+                while len(self.envelopes) == 0:
+                    self.changed.wait()
+                delay = self.first_added_at + self.window - time.time()
+                if delay > 0:
+                    self.changed.wait(delay)
+                    continue
+                envelopes = self.__take()
+            self.__emit(envelopes)
+
+    def get_stats(self) -> dict:
+        mean_size = self.frame_count / self.batch_count if self.batch_count > 0 else .0
+        return {'batches': self.batch_count, 'frames': self.frame_count, 'dropped': self.dropped_count, 'mean_size': mean_size}
@@ -0,0 +1,89 @@
+import struct
+from typing import Any, List
+
+# the binary wire format of a published frame, which is an alternative to the base64 json one:
+# magic (4s) | version (B) | flags (B) | source length (H) | name length (H) | timestamp (d) | sequence (Q) | image length (I)
+# followed by the utf-8 encoded source id, the utf-8 encoded name and the raw image (jpeg) bytes. All numbers are little-endian
+_MAGIC = b'FNKF'
+_VERSION = 1
+_HEADER = struct.Struct('<4sBBHHdQI')
+
+FLAG_AI_CLIP_ENABLED = 1
+# the image format is kept in the upper 4 bits of the flags, so the consumers of jpeg-only version 1 envelopes are not affected
+_FORMAT_SHIFT = 4
+_FORMATS = ('jpeg', 'webp', 'png')
+
+
+class FrameEnvelope:
+    def __init__(self):
+        self.source: str = ''
+        self.name: str = ''
+        self.ai_clip_enabled: bool = False
+        self.timestamp: float = .0
+        self.sequence: int = 0
+        self.img: bytes = b''
+        self.format: str = 'jpeg'
+
+
+def encode_envelope(source: str, name: str, ai_clip_enabled: bool, timestamp: float, sequence: int, img: Any, image_format: str = 'jpeg') -> bytes:
+    source_bytes = source.encode('utf-8')
+    name_bytes = name.encode('utf-8')
+    img_view = memoryview(img).cast('B')
+    flags = FLAG_AI_CLIP_ENABLED if ai_clip_enabled else 0
+    flags |= _FORMATS.index(image_format) << _FORMAT_SHIFT
+    header = _HEADER.pack(_MAGIC, _VERSION, flags, len(source_bytes), len(name_bytes), timestamp, sequence, img_view.nbytes)
+    # join copies the image only once
+    return b''.join((header, source_bytes, name_bytes, img_view))
+
+
+def decode_envelope(data: bytes) -> FrameEnvelope:
+    magic, version, flags, source_len, name_len, timestamp, sequence, img_len = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError('invalid frame envelope')
+    if version != _VERSION:
+        raise ValueError(f'unsupported frame envelope version: {version}')
+    envelope = FrameEnvelope()
+    offset = _HEADER.size
+    envelope.source = data[offset:offset + source_len].decode('utf-8')
+    offset += source_len
+    envelope.name = data[offset:offset + name_len].decode('utf-8')
+    offset += name_len
+    envelope.img = data[offset:offset + img_len]
+    envelope.ai_clip_enabled = (flags & FLAG_AI_CLIP_ENABLED) != 0
+    format_index = flags >> _FORMAT_SHIFT
+    envelope.format = _FORMATS[format_index] if format_index < len(_FORMATS) else ''
+    envelope.timestamp = timestamp
+    envelope.sequence = sequence
+    return envelope
+
+
+# a batch of frame envelopes of the cameras of a reader process, which is published as one message for the batched inference:
+# magic (4s) | version (B) | frame count (H) followed by the frames, each one as envelope length (I) | envelope
+_BATCH_MAGIC = b'FNKB'
+_BATCH_HEADER = struct.Struct('<4sBH')
+_BATCH_LENGTH = struct.Struct('<I')
+MAX_BATCH_SIZE = 65535  # the frame count is an unsigned short
+
+
+def encode_batch(envelopes: List[bytes]) -> bytes:
+    parts = [_BATCH_HEADER.pack(_BATCH_MAGIC, _VERSION, len(envelopes))]
+    for envelope in envelopes:
+        parts.append(_BATCH_LENGTH.pack(len(envelope)))
+        parts.append(envelope)
+    return b''.join(parts)
+
+
+def decode_batch(data: bytes) -> List[FrameEnvelope]:
+    magic, version, count = _BATCH_HEADER.unpack_from(data, 0)
+    if magic != _BATCH_MAGIC:
+        raise ValueError('invalid frame batch')
+    if version != _VERSION:
+        raise ValueError(f'unsupported frame batch version: {version}')
+    envelopes = []
+    offset = _BATCH_HEADER.size
+    for _ in range(count):
+        length, = _BATCH_LENGTH.unpack_from(data, offset)
+        offset += _BATCH_LENGTH.size
+        envelopes.append(decode_envelope(data[offset:offset + length]))
+        offset += length
+    return envelopes
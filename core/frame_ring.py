@@ -0,0 +1,168 @@
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict
+
+import numpy as np
+
+from common.utilities import logger
+
+# a per-camera ring of raw (BGR) frames in shared memory, it is used by the consumers on the same host instead of the jpeg/base64 round-trip.
+# layout: ring header (64 bytes) followed by slot_count slots. Each slot starts with sequence (Q) | timestamp (d) and is followed by the frame.
+# the writer sets the sequence of a slot to zero before writing the frame, so a consumer can detect a slot which has been overwritten meanwhile.
+# a ring is recreated with the same name (i.e. when the camera reconnects), the generation in the ring header and in the notification tells
+# the consumers to attach again instead of reading the old, unlinked segment
+_MAGIC = b'FNKR'
+_VERSION = 1
+_RING_HEADER = struct.Struct('<4sHHIIIQ')
+_RING_HEADER_SIZE = 64
+_SLOT_HEADER = struct.Struct('<Qd')
+_ALIGNMENT = 64
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def create_ring_name(identifier: str) -> str:
+    return f'feniks_read_{identifier}'
+
+
+class FrameRing:
+    def __init__(self, shm: shared_memory.SharedMemory, slot_count: int, height: int, width: int, channels: int, generation: int, owner: bool):
+        self.shm = shm
+        self.name = shm.name
+        self.slot_count = slot_count
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.generation = generation
+        self.owner = owner
+        self.frame_size = height * width * channels
+        self.slot_stride = _align(_SLOT_HEADER.size + self.frame_size)
+
+    @staticmethod
+    def calc_size(slot_count: int, height: int, width: int, channels: int) -> int:
+        return _RING_HEADER_SIZE + slot_count * _align(_SLOT_HEADER.size + height * width * channels)
+
+    @staticmethod
+    def create(name: str, slot_count: int, height: int, width: int, channels: int):
+        try:
+            # a ring which has been left by a killed reader
+            previous = shared_memory.SharedMemory(name=name)
+            previous.close()
+            previous.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=FrameRing.calc_size(slot_count, height, width, channels))
+        generation = int.from_bytes(os.urandom(8), 'little') or 1  # 0 means unknown for the consumers
+        _RING_HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, slot_count, height, width, channels, generation)
+        return FrameRing(shm, slot_count, height, width, channels, generation, True)
+
+    @staticmethod
+    def attach(name: str):
+        shm = shared_memory.SharedMemory(name=name)
+        # the consumer must not unlink the ring of the reader when it exits
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        magic, version, slot_count, height, width, channels, generation = _RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            shm.close()
+            raise ValueError(f'invalid frame ring: {name}')
+        return FrameRing(shm, slot_count, height, width, channels, generation, False)
+
+    def _get_slot_offset(self, slot: int) -> int:
+        return _RING_HEADER_SIZE + slot * self.slot_stride
+
+    def _get_frame(self, slot: int) -> np.array:
+        offset = self._get_slot_offset(slot) + _SLOT_HEADER.size
+        return np.ndarray((self.height, self.width, self.channels), dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+
+    def write(self, img: np.array, timestamp: float, sequence: int) -> int:
+        slot = sequence % self.slot_count
+        offset = self._get_slot_offset(slot)
+        _SLOT_HEADER.pack_into(self.shm.buf, offset, 0, timestamp)
+        np.copyto(self._get_frame(slot), img.reshape((self.height, self.width, self.channels)))
+        _SLOT_HEADER.pack_into(self.shm.buf, offset, sequence, timestamp)
+        return slot
+
+    # returns a view on the shared memory without copying the frame, is_valid should be checked after it has been processed
+    def read(self, slot: int, sequence: int) -> np.array:
+        if not self.is_valid(slot, sequence):
+            return None
+        return self._get_frame(slot)
+
+    def is_valid(self, slot: int, sequence: int) -> bool:
+        if slot < 0 or slot >= self.slot_count:
+            return False
+        current, _ = _SLOT_HEADER.unpack_from(self.shm.buf, self._get_slot_offset(slot))
+        return current == sequence
+
+    # the segment is unlinked even if it can not be closed, i.e. a view on it is still alive (BufferError), so it does not leak
+    def close(self):
+        try:
+            self.shm.close()
+        except BaseException as ex:
+            logger.error(f'an error occurred while closing the frame ring ({self.name}), err: {ex}')
+        finally:
+            if self.owner:
+                self.__unlink()
+
+    def __unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        except BaseException as ex:
+            logger.error(f'an error occurred while unlinking the frame ring ({self.name}), err: {ex}')
+
+
+# recreates the ring of a camera when the frame size changes
+class FrameRingWriter:
+    def __init__(self, name: str, slot_count: int):
+        self.name = name
+        self.slot_count = slot_count
+        self.ring: FrameRing | None = None
+
+    def write(self, img: np.array, timestamp: float, sequence: int) -> int:
+        height, width = img.shape[0], img.shape[1]
+        channels = img.shape[2] if img.ndim > 2 else 1
+        ring = self.ring
+        if ring is None or ring.height != height or ring.width != width or ring.channels != channels:
+            self.close()
+            ring = FrameRing.create(self.name, self.slot_count, height, width, channels)
+            self.ring = ring
+            logger.info(f'frame ring ({self.name}) has been created for {width}x{height}x{channels} frames')
+        return ring.write(img, timestamp, sequence)
+
+    # the generation of the ring which has been written last, it is sent with the notification
+    def get_generation(self) -> int:
+        return self.ring.generation if self.ring is not None else 0
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+# keeps the rings attached on the consumer side, a ring is attached again if the reader has recreated it
+class FrameRingReader:
+    def __init__(self):
+        self.rings: Dict[str, FrameRing] = {}
+
+    # generation 0 (a notification without it) falls back to comparing the frame size
+    def read(self, name: str, slot: int, sequence: int, height: int, width: int, generation: int = 0) -> np.array:
+        ring = self.rings.get(name)
+        if ring is None or ring.height != height or ring.width != width or (generation != 0 and ring.generation != generation):
+            if ring is not None:
+                ring.close()
+                del self.rings[name]
+            ring = FrameRing.attach(name)
+            self.rings[name] = ring
+        if generation != 0 and ring.generation != generation:
+            return None  # the ring of the notification has already been replaced
+        return ring.read(slot, sequence)
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+        self.rings.clear()
@@ -0,0 +1,260 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import psutil
+
+from common.event_bus.publisher_pool import PublisherPool
+from common.fork_safe import PerProcessStarter
+from common.utilities import logger, redis_pools
+from core.data.metrics_repository import MetricsRepository
+from core.encoder_pool import EncoderPool
+from core.reader_args import ReaderArgs
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5.)  # seconds
+_PREFIX = 'feniks_read'
+
+
+# a cumulative histogram like the prometheus one, counts[-1] is the +Inf bucket
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = .0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_json(self) -> str:
+        return json.dumps({'buckets': self.buckets, 'counts': self.counts, 'sum': self.sum, 'count': self.count})
+
+    @staticmethod
+    def from_json(value: str) -> 'Histogram':
+        dic = json.loads(value)
+        obj = Histogram(tuple(dic['buckets']))
+        obj.counts = dic['counts']
+        obj.sum = dic['sum']
+        obj.count = dic['count']
+        return obj
+
+
+# the pipeline statistics of a camera. They are updated by the capture, encoder and publisher threads of the reader process and written to
+# redis by the MetricsReporter, since the cameras run in many processes while the endpoint is served by the main one
+class CameraMetrics:
+    stages = ('grab', 'decode', 'encode', 'publish', 'frame_age')  # frame_age is observed only by the latest frame sources
+
+    def __init__(self, args: ReaderArgs):
+        self.identifier = args.identifier
+        self.name = args.name
+        self.encoder = ''
+        self.grabbed_count = 0
+        self.decoded_count = 0
+        self.published_count = 0
+        self.published_bytes = 0
+        self.dropped_count = 0  # replaced by a newer frame before it has been encoded or rejected by the publisher pool
+        self.last_frame_at = .0
+        self.latencies: Dict[str, Histogram] = {stage: Histogram() for stage in CameraMetrics.stages}
+        self.prev_published_count = 0
+        self.prev_grabbed_count = 0
+        self.prev_flushed_at = time.time()
+
+    def observe(self, stage: str, seconds: float):
+        self.latencies[stage].observe(seconds)
+
+    def to_redis(self) -> dict:
+        now = time.time()
+        elapsed = max(now - self.prev_flushed_at, 1e-3)
+        dic = {'id': self.identifier, 'name': self.name, 'encoder': self.encoder, 'pid': os.getpid(), 'updated_at': now, 'grabbed': self.grabbed_count,
+               'decoded': self.decoded_count, 'published': self.published_count, 'published_bytes': self.published_bytes,
+               'dropped': self.dropped_count, 'last_frame_at': self.last_frame_at,
+               'fps': (self.published_count - self.prev_published_count) / elapsed,
+               'capture_fps': (self.grabbed_count - self.prev_grabbed_count) / elapsed}
+        for stage, histogram in self.latencies.items():
+            dic[f'latency_{stage}'] = histogram.to_json()
+        self.prev_published_count = self.published_count
+        self.prev_grabbed_count = self.grabbed_count
+        self.prev_flushed_at = now
+        return dic
+
+
+# writes the camera and the process statistics of a reader process to redis periodically
+class MetricsReporter:
+    def __init__(self, repository: MetricsRepository, interval: float, enabled: bool, publisher_pool: PublisherPool, encoder_pool: EncoderPool):
+        self.repository = repository
+        self.interval = max(interval, 1.)
+        self.enabled = enabled
+        self.publisher_pool = publisher_pool
+        self.encoder_pool = encoder_pool
+        self.starter = PerProcessStarter(self.__start)
+        self.__init_state()
+        publisher_pool.add_observer(self.__on_published)
+
+    def __init_state(self):
+        self.lock = threading.Lock()
+        self.cameras: Dict[str, CameraMetrics] = {}
+
+    # the reporter is started by the process which captures, the cameras of the parent are not reported by the child
+    def __start(self):
+        self.__init_state()
+        if not self.enabled:
+            return
+        th = threading.Thread(target=self.__run)
+        th.daemon = True
+        th.start()
+
+    # a camera restarted in the same process goes on with its counters
+    def get(self, args: ReaderArgs) -> CameraMetrics:
+        self.starter.ensure_started()
+        with self.lock:
+            metrics = self.cameras.get(args.identifier)
+            if metrics is None:
+                metrics = CameraMetrics(args)
+                self.cameras[args.identifier] = metrics
+            return metrics
+
+    def find(self, identifier: str) -> CameraMetrics:
+        return self.cameras.get(identifier) if self.starter.is_started() else None
+
+    # a frame is published to more than one channel if more than one output is enabled, every message is observed
+    def __on_published(self, identifier: str, waited: float, took: float):
+        metrics = self.find(identifier)
+        if metrics is not None:
+            metrics.observe('publish', waited + took)
+
+    def remove(self, identifier: str):
+        with self.lock:
+            self.cameras.pop(identifier, None)
+        try:
+            self.repository.remove(identifier)
+        except BaseException as ex:
+            logger.error(f'an error occurred while removing the metrics of ({identifier}), err: {ex}')
+
+    def __run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except BaseException as ex:
+                logger.error(f'an error occurred while flushing the metrics, err: {ex}')
+
+    def flush(self):
+        with self.lock:
+            cameras = list(self.cameras.values())
+        self.repository.add_all([metrics.to_redis() for metrics in cameras])
+        publisher_stats = self.publisher_pool.get_stats()
+        stats = {'pid': os.getpid(), 'rss': get_rss(), 'cameras': len(cameras), 'publisher_depth': publisher_stats['depth'],
+                 'publisher_dropped': publisher_stats['dropped'], 'publisher_failed': publisher_stats['failed'],
+                 'publisher_batches': publisher_stats['batches'], 'publisher_mean_batch_size': publisher_stats['mean_batch_size'],
+                 'publisher_mean_coalesce_wait': publisher_stats['mean_coalesce_wait'],
+                 'encoder_pending': self.encoder_pool.get_stats()['pending'], 'redis_connections': redis_pools.get_connection_count()}
+        # a process which has died disappears from the endpoint after a few missed flushes
+        self.repository.add_process(os.getpid(), stats, int(self.interval * 3))
+
+
+def get_rss(pid: int = None) -> int:
+    try:
+        return psutil.Process(pid if pid is not None else os.getpid()).memory_info().rss
+    except BaseException:
+        return 0
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# builds the prometheus text exposition format
+class MetricsWriter:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.declared = set()
+
+    def add(self, name: str, metric_type: str, help_text: str, value: float, labels: dict = None):
+        full_name = f'{_PREFIX}_{name}'
+        if full_name not in self.declared:
+            self.declared.add(full_name)
+            self.lines.append(f'# HELP {full_name} {help_text}')
+            self.lines.append(f'# TYPE {full_name} {metric_type}')
+        self.lines.append(f'{full_name}{self.__labels(labels)} {float(value)}')
+
+    def add_histogram(self, name: str, help_text: str, histogram: Histogram, labels: dict):
+        full_name = f'{_PREFIX}_{name}'
+        if full_name not in self.declared:
+            self.declared.add(full_name)
+            self.lines.append(f'# HELP {full_name} {help_text}')
+            self.lines.append(f'# TYPE {full_name} histogram')
+        cumulative = 0
+        for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+            cumulative += count
+            self.lines.append(f'{full_name}_bucket{self.__labels(dict(labels, le=str(bound)))} {cumulative}')
+        self.lines.append(f'{full_name}_sum{self.__labels(labels)} {histogram.sum}')
+        self.lines.append(f'{full_name}_count{self.__labels(labels)} {histogram.count}')
+
+    @staticmethod
+    def __labels(labels: dict) -> str:
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+    def to_text(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+_CAMERA_COUNTERS = (('grabbed', 'frames_grabbed_total', 'frames grabbed from the source'),
+                    ('decoded', 'frames_decoded_total', 'frames decoded'),
+                    ('published', 'frames_published_total', 'frames published'),
+                    ('published_bytes', 'published_bytes_total', 'encoded image bytes published'),
+                    ('dropped', 'frames_dropped_total', 'frames dropped before they have been published'))
+
+
+def render_metrics(camera_stats: List[Dict[str, str]], process_stats: List[Dict[str, str]], reconnect_states: list,
+                   service: List[Tuple[str, str, float]]) -> str:
+    writer = MetricsWriter()
+    now = time.time()
+    # the samples of a metric must be grouped, so it iterates the cameras for every metric
+    cameras = [(dic, {'camera': dic.get('name', ''), 'id': dic.get('id', '')}) for dic in camera_stats]
+    for dic, labels in cameras:
+        writer.add('camera_info', 'gauge', 'the encoder backend of a camera', 1, dict(labels, encoder=dic.get('encoder', '')))
+    for dic, labels in cameras:
+        writer.add('camera_fps', 'gauge', 'published frames per second since the previous flush', float(dic.get('fps', 0)), labels)
+    for dic, labels in cameras:
+        writer.add('camera_capture_fps', 'gauge', 'grabbed frames per second since the previous flush', float(dic.get('capture_fps', 0)), labels)
+    for field, name, help_text in _CAMERA_COUNTERS:
+        for dic, labels in cameras:
+            writer.add(f'camera_{name}', 'counter', help_text, float(dic.get(field, 0)), labels)
+    for dic, labels in cameras:
+        last_frame_at = float(dic.get('last_frame_at', 0))
+        writer.add('camera_seconds_since_last_frame', 'gauge', 'seconds since the last decoded frame, -1 if there has been none',
+                   now - last_frame_at if last_frame_at > 0 else -1, labels)
+    for stage in CameraMetrics.stages:
+        for dic, labels in cameras:
+            value = dic.get(f'latency_{stage}')
+            if value is not None:
+                help_text = 'age of a frame when it has been retrieved' if stage == 'frame_age' else f'{stage} latency of a frame'
+                writer.add_histogram(f'camera_{stage}_seconds', help_text, Histogram.from_json(value), labels)
+    for state in reconnect_states:
+        writer.add('camera_reconnects_total', 'counter', 'failures which have been followed by a reconnect', state.failure_count,
+                   {'camera': state.name, 'id': state.id})
+    for state in reconnect_states:
+        writer.add('camera_parked', 'gauge', '1 if the retry budget has been exhausted', 1 if state.parked else 0, {'camera': state.name, 'id': state.id})
+    for field, name, metric_type, help_text in (('rss', 'process_rss_bytes', 'gauge', 'resident memory of a reader process'),
+                                                ('cameras', 'process_cameras', 'gauge', 'cameras captured by a reader process'),
+                                                ('publisher_depth', 'publisher_queue_depth', 'gauge', 'messages waiting in the publisher pool'),
+                                                ('publisher_dropped', 'publisher_dropped_total', 'counter', 'messages dropped by the publisher pool'),
+                                                ('publisher_failed', 'publisher_failed_total', 'counter', 'messages which could not be published'),
+                                                ('publisher_batches', 'publisher_batches_total', 'counter', 'pipelines sent by the publisher pool'),
+                                                ('publisher_mean_batch_size', 'publisher_mean_batch_size', 'gauge', 'mean messages per pipeline'),
+                                                ('publisher_mean_coalesce_wait', 'publisher_mean_coalesce_wait_seconds', 'gauge',
+                                                 'mean latency which has been added by waiting for a pipeline to be filled'),
+                                                ('encoder_pending', 'encoder_queue_depth', 'gauge', 'frames waiting in the encoder pool'),
+                                                ('redis_connections', 'process_redis_connections', 'gauge', 'redis connections opened by a reader process')):
+        for dic in process_stats:
+            writer.add(name, metric_type, help_text, float(dic.get(field, 0)), {'pid': dic.get('pid', '')})
+    for name, help_text, value in service:
+        writer.add(name, 'gauge', help_text, value)
+    return writer.to_text()
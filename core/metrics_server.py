@@ -0,0 +1,49 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from common.utilities import logger
+
+
+# serves the prometheus text format on /metrics, the text is rendered on every scrape
+class MetricsServer:
+    def __init__(self, host: str, port: int, render: Callable[[], str]):
+        self.host = host
+        self.port = port
+        self.render = render
+        self.server: ThreadingHTTPServer | None = None
+
+    def start(self):
+        render = self.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                try:
+                    body = render().encode('utf-8')
+                except BaseException as ex:
+                    logger.error(f'an error occurred while rendering the metrics, err: {ex}')
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # every scrape would be logged otherwise
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        th = threading.Thread(target=self.server.serve_forever)
+        th.daemon = True
+        th.start()
+        logger.info(f'metrics endpoint has been started on http://{self.host}:{self.port}/metrics')
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
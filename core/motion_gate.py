@@ -0,0 +1,73 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+from common.data.source_model import MotionDetectionType
+from core.reader_args import ReaderArgs
+
+_GATE_WIDTH = 160
+
+
+# skips the frames which have not changed meaningfully since the last published one. The frames are compared on a downsampled grayscale copy.
+# a frame is published anyway if nothing has been published for max_silence seconds, so the consumers still get a keep-alive frame
+class MotionGate:
+    def __init__(self, args: ReaderArgs, max_silence: float):
+        self.md_type = MotionDetectionType(args.md_type)
+        self.opencv_threshold = args.md_opencv_threshold
+        self.imagehash_threshold = args.md_imagehash_threshold
+        # md_psnr_threshold is the normalized rms difference, so it is 10^(-psnr/20)
+        self.psnr_threshold_db = -20. * math.log10(args.md_psnr_threshold) if args.md_psnr_threshold > 0 else 0.
+        self.contour_area_limit = args.md_contour_area_limit
+        self.snapshot_area = max(args.width * args.height, 1)  # md_contour_area_limit is for the snapshot size
+        self.max_silence = max_silence
+        self.last_gray: np.array = None
+        self.last_hash: np.array = None
+        self.last_published_at = .0
+        self.skipped_count = 0
+
+    @staticmethod
+    def _to_gray(img: np.array) -> np.array:
+        height = max(int(img.shape[0] * _GATE_WIDTH / img.shape[1]), 1)
+        small = cv2.resize(img, (_GATE_WIDTH, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    # difference hash, it is what imagehash.dhash computes
+    @staticmethod
+    def _dhash(gray: np.array) -> np.array:
+        resized = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        return resized[:, 1:] > resized[:, :-1]
+
+    def should_publish(self, img: np.array) -> bool:
+        if self.md_type == MotionDetectionType.NoMotionDetection:
+            return True
+        now = time.time()
+        gray = self._to_gray(img)
+        if self.last_gray is None or self.last_gray.shape != gray.shape or now - self.last_published_at >= self.max_silence:
+            changed = True
+        elif self.md_type == MotionDetectionType.ImageHash:
+            changed = int(np.count_nonzero(self._dhash(gray) != self.last_hash)) > self.imagehash_threshold
+        elif self.md_type == MotionDetectionType.Psnr:
+            changed = cv2.PSNR(gray, self.last_gray) < self.psnr_threshold_db
+        else:
+            changed = self._has_motion(gray)
+        if not changed:
+            self.skipped_count += 1
+            return False
+        self.last_gray = gray
+        if self.md_type == MotionDetectionType.ImageHash:
+            self.last_hash = self._dhash(gray)
+        self.last_published_at = now
+        return True
+
+    def _has_motion(self, gray: np.array) -> bool:
+        delta = cv2.absdiff(cv2.GaussianBlur(self.last_gray, (5, 5), 0), cv2.GaussianBlur(gray, (5, 5), 0))
+        thresh = cv2.threshold(delta, self.opencv_threshold, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        contours = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        area_limit = self.contour_area_limit * gray.shape[0] * gray.shape[1] / self.snapshot_area
+        for contour in contours:
+            if cv2.contourArea(contour) >= area_limit:
+                return True
+        return False
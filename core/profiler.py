@@ -0,0 +1,193 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Dict
+
+from common.utilities import logger
+from common.event_bus.publisher_pool import PublisherPool
+from common.fork_safe import PerProcessStarter
+from core.data.profile_repository import ProfileRepository
+from core.metrics import Histogram
+from core.reader_args import ReaderArgs
+
+PROFILE_STAGES = ('read', 'encode', 'serialize', 'publish')
+_RESULT_TTL = 86400
+
+
+# the upper bound of the bucket which contains the quantile, the largest observed value if it is in the +Inf bucket
+def _estimate_quantile(histogram: Histogram, q: float, max_value: float) -> float:
+    target = q * histogram.count
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        if cumulative >= target:
+            return min(bound, max_value)
+    return max_value
+
+
+def summarize(histogram: Histogram, max_value: float) -> str:
+    if histogram.count == 0:
+        return '{}'
+    ms = 1000.
+    return json.dumps({'n': histogram.count, 'mean': round(histogram.sum / histogram.count * ms, 3),
+                       'p50': round(_estimate_quantile(histogram, .5, max_value) * ms, 3),
+                       'p95': round(_estimate_quantile(histogram, .95, max_value) * ms, 3),
+                       'p99': round(_estimate_quantile(histogram, .99, max_value) * ms, 3), 'max': round(max_value * ms, 3)})
+
+
+class _Capture:
+    def __init__(self, duration: float):
+        self.profile = cProfile.Profile()
+        self.started_at = time.time()
+        self.ends_at = self.started_at + duration
+
+    def is_expired(self) -> bool:
+        return time.time() >= self.ends_at
+
+    def to_report(self, name: str) -> str:
+        stream = io.StringIO()
+        stream.write(f'camera ({name}), pid: {os.getpid()}, duration: {time.time() - self.started_at:.1f}s\n')
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(50)
+        return stream.getvalue()
+
+
+# opt-in stage timings of one frame in sample_every, kept in in-process histograms and flushed to redis as compact summaries (ms) which are
+# reset after every flush. Independently of the sampling, a cProfile capture of a camera's capture thread can be requested through redis
+class StageProfiler:
+    def __init__(self, repository: ProfileRepository, enabled: bool, sample_every: int, flush_interval: float, commands_enabled: bool,
+                 command_check_interval: float, max_capture_duration: float, publisher_pool: PublisherPool):
+        self.repository = repository
+        self.enabled = enabled
+        self.sample_every = max(1, sample_every)
+        self.flush_interval = max(flush_interval, 1.)
+        self.commands_enabled = commands_enabled
+        self.command_check_interval = max(command_check_interval, .1)
+        self.max_capture_duration = max_capture_duration
+        self.starter = PerProcessStarter(self.__start)
+        self.__init_state()
+        if enabled:
+            publisher_pool.add_observer(self.__on_published)
+
+    def __init_state(self):
+        self.lock = threading.Lock()
+        self.cameras: Dict[str, str] = {}
+        self.frame_counts: Dict[str, int] = {}
+        self.message_counts: Dict[str, int] = {}
+        self.histograms: Dict[str, Dict[str, Histogram]] = {}
+        self.max_values: Dict[str, Dict[str, float]] = {}
+        self.requests: Dict[str, float] = {}
+        self.captures: Dict[str, _Capture] = {}
+
+    # the profiler thread is started by the process which captures
+    def __start(self):
+        self.__init_state()
+        if not self.enabled and not self.commands_enabled:
+            return
+        th = threading.Thread(target=self.__run)
+        th.daemon = True
+        th.start()
+
+    def register(self, args: ReaderArgs):
+        self.starter.ensure_started()
+        with self.lock:
+            self.cameras[args.identifier] = args.name
+            if args.identifier not in self.histograms:
+                self.histograms[args.identifier] = {stage: Histogram() for stage in PROFILE_STAGES}
+                self.max_values[args.identifier] = {stage: .0 for stage in PROFILE_STAGES}
+
+    # the running capture is saved, i.e. if the camera fails while it is being profiled
+    def unregister(self, args: ReaderArgs):
+        self.end_capture(args)
+        with self.lock:
+            self.cameras.pop(args.identifier, None)
+
+    def sample(self, identifier: str) -> bool:
+        if not self.enabled:
+            return False
+        count = self.frame_counts.get(identifier, 0) + 1
+        self.frame_counts[identifier] = count
+        return count % self.sample_every == 0
+
+    def record(self, identifier: str, stage: str, seconds: float):
+        histograms = self.histograms.get(identifier)
+        if histograms is None:
+            return
+        histograms[stage].observe(seconds)
+        max_values = self.max_values[identifier]
+        if seconds > max_values[stage]:
+            max_values[stage] = seconds
+
+    # the publisher threads do not know which frame has been sampled, so the messages are sampled on their own
+    def __on_published(self, identifier: str, waited: float, took: float):
+        if not self.starter.is_started() or identifier not in self.histograms:
+            return
+        count = self.message_counts.get(identifier, 0) + 1
+        self.message_counts[identifier] = count
+        if count % self.sample_every == 0:
+            self.record(identifier, 'publish', took)
+
+    # cProfile profiles only the thread which enables it, so it is called by the capture thread of the camera
+    def begin_capture(self, args: ReaderArgs) -> bool:
+        if args.identifier in self.captures:
+            return True
+        duration = self.requests.pop(args.identifier, None)
+        if duration is None:
+            return False
+        capture = _Capture(min(duration, self.max_capture_duration))
+        self.captures[args.identifier] = capture
+        capture.profile.enable()
+        logger.warning(f'camera ({args.name}) is being profiled for {capture.ends_at - capture.started_at:.0f}s')
+        return True
+
+    def check_capture(self, args: ReaderArgs):
+        capture = self.captures.get(args.identifier)
+        if capture is not None and capture.is_expired():
+            self.end_capture(args)
+
+    def end_capture(self, args: ReaderArgs):
+        capture = self.captures.pop(args.identifier, None)
+        if capture is None:
+            return
+        capture.profile.disable()
+        try:
+            self.repository.add_result(args.identifier, capture.to_report(args.name), _RESULT_TTL)
+            logger.warning(f'camera ({args.name}) profile has been saved to redis')
+        except BaseException as ex:
+            logger.error(f'an error occurred while saving the profile of camera ({args.name}), err: {ex}')
+
+    def __run(self):
+        prev_flush = time.time()
+        while True:
+            time.sleep(self.command_check_interval if self.commands_enabled else self.flush_interval)
+            try:
+                if self.commands_enabled:
+                    self.__take_requests()
+                if self.enabled and time.time() - prev_flush >= self.flush_interval:
+                    prev_flush = time.time()
+                    self.flush()
+            except BaseException as ex:
+                logger.error(f'an error occurred in the profiler, err: {ex}')
+
+    def __take_requests(self):
+        requests = self.repository.get_requests()
+        for identifier, duration in requests.items():
+            if identifier in self.cameras and identifier not in self.requests and self.repository.take_request(identifier):
+                self.requests[identifier] = duration
+
+    def flush(self):
+        summaries = {}
+        now = time.time()
+        with self.lock:
+            for identifier, name in self.cameras.items():
+                histograms, max_values = self.histograms[identifier], self.max_values[identifier]
+                summary = {'name': name, 'pid': os.getpid(), 'updated_at': now, 'sample_every': self.sample_every}
+                for stage in PROFILE_STAGES:
+                    summary[stage] = summarize(histograms[stage], max_values[stage])
+                summaries[identifier] = summary
+                self.histograms[identifier] = {stage: Histogram() for stage in PROFILE_STAGES}
+                self.max_values[identifier] = {stage: .0 for stage in PROFILE_STAGES}
+        self.repository.add_summaries(summaries)
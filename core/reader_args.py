@@ -0,0 +1,78 @@
+import hashlib
+import json
+from typing import List
+
+from stream.stream_model import StreamModel
+
+
+# everything a reader needs to capture a camera, it is pickled by rq and saved into jober as json
+class ReaderArgs:
+    def __init__(self):
+        self.fps: int = 1
+        self.buffer_size: int = 2
+        self.identifier: str = ''
+        self.name: str = ''
+        self.rtsp_address: str = ''
+        self.width: int = 640
+        self.height: int = 360
+        self.ai_clip_enabled: bool = False
+        self.quality: int = 95
+        self.progressive: bool = False
+        self.optimize: bool = False
+        self.chroma_subsampling: int = 0
+        self.byte_budget: int = 0
+        self.encoder: int = 0
+        self.png_compression: int = 1
+        self.rtsp_transport: int = 0
+        self.probe_size: int = 0
+        self.analyzation_duration: int = 0
+        self.md_type: int = 1
+        self.md_opencv_threshold: int = 30
+        self.md_contour_area_limit: int = 10000
+        self.md_imagehash_threshold: int = 3
+        self.md_psnr_threshold: float = 0.2
+
+    @staticmethod
+    def create(stream: StreamModel, rtsp_address: str, buffer_size: int):
+        args = ReaderArgs()
+        args.fps = stream.snapshot_frame_rate
+        args.buffer_size = buffer_size
+        args.identifier = stream.id
+        args.name = stream.name
+        args.rtsp_address = rtsp_address
+        args.width = stream.snapshot_width
+        args.height = stream.snapshot_height
+        args.ai_clip_enabled = stream.ai_clip_enabled
+        args.quality = stream.snapshot_quality
+        args.progressive = stream.snapshot_progressive
+        args.optimize = stream.snapshot_optimize
+        args.chroma_subsampling = int(stream.snapshot_chroma_subsampling)
+        args.byte_budget = stream.snapshot_byte_budget
+        args.encoder = int(stream.snapshot_encoder)
+        args.png_compression = stream.snapshot_png_compression
+        args.rtsp_transport = int(stream.rtsp_transport)
+        args.probe_size = stream.probe_size
+        args.analyzation_duration = stream.analyzation_duration
+        args.md_type = int(stream.md_type)
+        args.md_opencv_threshold = stream.md_opencv_threshold
+        args.md_contour_area_limit = stream.md_contour_area_limit
+        args.md_imagehash_threshold = stream.md_imagehash_threshold
+        args.md_psnr_threshold = stream.md_psnr_threshold
+        return args
+
+    # changes whenever any argument changes, it is used to detect the reconfigured cameras
+    def get_version(self) -> str:
+        return hashlib.sha1(json.dumps(self.__dict__, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def to_json(args_list: List['ReaderArgs']) -> str:
+        return json.dumps([args.__dict__ for args in args_list], ensure_ascii=False)
+
+    @staticmethod
+    def from_json(value: str) -> List['ReaderArgs']:
+        args_list: List[ReaderArgs] = []
+        for dic in json.loads(value):
+            args = ReaderArgs()
+            args.__dict__.update(dic)
+            args_list.append(args)
+        return args_list
@@ -0,0 +1,61 @@
+import threading
+import time
+from typing import Callable, Dict, List
+
+from common.utilities import logger
+from core.reader_args import ReaderArgs
+
+
+# captures a single camera and restarts it when it fails, so a failed camera does not affect the others in the same process.
+# the target returns True if the camera has been stopped on purpose. on_failed receives how long the camera has run and returns how long to
+# wait before the restart
+class CameraThread(threading.Thread):
+    def __init__(self, args: ReaderArgs, target: Callable[[ReaderArgs], bool], on_failed: Callable[[ReaderArgs, BaseException, float], float],
+                 retry_interval: float):
+        super().__init__()
+        self.daemon = True
+        self.args = args
+        self.target = target
+        self.on_failed = on_failed
+        self.retry_interval = retry_interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            ex = None
+            started_at = time.time()
+            try:
+                if self.target(self.args):
+                    logger.warning(f'camera ({self.args.name}) has been stopped')
+                    break
+            except BaseException as e:
+                ex = e
+                logger.error(f'camera ({self.args.name}) has been failed, err: {e}')
+            delay = self.retry_interval
+            try:
+                delay = self.on_failed(self.args, ex, time.time() - started_at)
+            except BaseException as e:
+                logger.error(f'an error occurred while handling the failure of camera ({self.args.name}), err: {e}')
+            self.stopped.wait(delay)
+
+
+# runs many cameras in one process instead of one process per camera
+class ReaderEngine:
+    def __init__(self, target: Callable[[ReaderArgs], bool], on_failed: Callable[[ReaderArgs, BaseException, float], float],
+                 retry_interval: float = 5.):
+        self.target = target
+        self.on_failed = on_failed
+        self.retry_interval = retry_interval
+        self.threads: Dict[str, CameraThread] = {}
+
+    def start(self, args: ReaderArgs):
+        th = CameraThread(args, self.target, self.on_failed, self.retry_interval)
+        self.threads[args.identifier] = th
+        th.start()
+        logger.info(f'camera ({args.name}) has been started by the reader engine')
+
+    def run(self, args_list: List[ReaderArgs]):
+        for args in args_list:
+            self.start(args)
+        for th in list(self.threads.values()):
+            th.join()
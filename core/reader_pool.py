@@ -0,0 +1,177 @@
+import heapq
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+from common.utilities import logger
+from core.reader_args import ReaderArgs
+
+# the members are forked from the supervisor process, which has already imported cv2, numpy and the rest, so they share those pages
+# copy-on-write instead of importing them again like a new rq worker does
+_context = multiprocessing.get_context('fork')
+
+
+def _run_assignment(member_id: int, token: int, args: ReaderArgs, target: Callable[[ReaderArgs], bool], results):
+    started_at = time.time()
+    stopped = False
+    err = ''
+    try:
+        stopped = target(args)
+    except BaseException as e:
+        err = str(e)
+        logger.error(f'camera ({args.name}) has been failed in reader pool member {member_id}, err: {e}')
+    results.put((member_id, token, stopped, time.time() - started_at, err))
+
+
+def _member_main(member_id: int, tasks, results, target: Callable[[ReaderArgs], bool]):
+    # the member holds the writer end of its own task queue, so it never sees EOF when the supervisor has been killed. It polls the parent
+    # instead, an orphaned member would keep publishing the frames of its cameras next to the readers of the restarted supervisor
+    parent_pid = os.getppid()
+    while True:
+        try:
+            task = tasks.get(timeout=1.)
+        except queue.Empty:
+            if os.getppid() != parent_pid:
+                logger.warning(f'reader pool member {member_id} is exiting since its supervisor (pid: {parent_pid}) has died')
+                os._exit(0)
+            continue
+        if task is None:
+            break
+        token, args = task
+        th = threading.Thread(target=_run_assignment, args=(member_id, token, args, target, results))
+        th.daemon = True
+        th.start()
+
+
+class _Member:
+    def __init__(self, member_id: int, target: Callable[[ReaderArgs], bool], results):
+        self.id = member_id
+        self.tasks = _context.Queue()
+        # keyed by the token of the assignment instead of the camera id, since a restarted camera can overlap its previous reader
+        # which is still stopping
+        self.assigned: Dict[int, ReaderArgs] = {}
+        self.proc = _context.Process(target=_member_main, args=(member_id, self.tasks, results, target))
+        self.proc.daemon = True
+        self.proc.start()
+
+    def stop(self):
+        try:
+            self.tasks.put(None)
+            self.proc.terminate()
+        except BaseException as ex:
+            logger.error(f'an error occurred while stopping reader pool member {self.id}, err: {ex}')
+
+
+# a fixed set of pre-forked reader processes. The supervisor hands the cameras over to the members which have free capacity, a failed camera
+# is handed over again after the delay returned by on_failed, and a dead member is replaced by a new fork with its cameras reassigned
+class ReaderPool:
+    def __init__(self, size: int, capacity: int, target: Callable[[ReaderArgs], bool],
+                 on_failed: Callable[[ReaderArgs, BaseException, float], float]):
+        self.size = max(1, size)
+        self.capacity = max(1, capacity)
+        self.target = target
+        self.on_failed = on_failed
+        self.results = _context.Queue()
+        self.members: Dict[int, _Member] = {}
+        self.next_member_id = 0
+        self.next_token = 0
+        self.pending: Deque[ReaderArgs] = deque()
+        self.delayed: List[Tuple[float, int, ReaderArgs]] = []
+        self.delayed_seq = 0
+        self.unplaced_count = 0
+        self.lock = threading.Lock()
+        self.stopped = False
+
+    def start(self):
+        for _ in range(self.size):
+            self.__add_member()
+        th = threading.Thread(target=self.__supervise)
+        th.daemon = True
+        th.start()
+        logger.info(f'reader pool has been started with {self.size} member(s), capacity per member: {self.capacity}')
+
+    def stop(self):
+        self.stopped = True
+        for member in self.members.values():
+            member.stop()
+
+    def assign(self, args: ReaderArgs):
+        with self.lock:
+            self.pending.append(args)
+
+    def __add_member(self):
+        member = _Member(self.next_member_id, self.target, self.results)
+        with self.lock:
+            self.members[member.id] = member
+        self.next_member_id += 1
+
+    def __supervise(self):
+        while not self.stopped:
+            try:
+                self.__handle_result(self.results.get(timeout=.1))
+                continue  # drains the results before dispatching
+            except queue.Empty:
+                pass
+            except BaseException as ex:
+                logger.error(f'an error occurred while handling a reader pool result, err: {ex}')
+            try:
+                self.__replace_dead_members()
+                self.__dispatch()
+            except BaseException as ex:
+                logger.error(f'an error occurred while supervising the reader pool, err: {ex}')
+
+    def __handle_result(self, result: tuple):
+        member_id, token, stopped, ran_for, err = result
+        with self.lock:
+            member = self.members.get(member_id)
+            args = member.assigned.pop(token, None) if member is not None else None
+        if args is None:
+            return
+        if stopped:
+            logger.warning(f'camera ({args.name}) has been stopped, it has been released by reader pool member {member_id}')
+            return
+        delay = self.on_failed(args, RuntimeError(err) if len(err) > 0 else None, ran_for)
+        self.__schedule(args, delay)
+
+    def __schedule(self, args: ReaderArgs, delay: float):
+        with self.lock:
+            self.delayed_seq += 1
+            heapq.heappush(self.delayed, (time.time() + delay, self.delayed_seq, args))
+
+    def __replace_dead_members(self):
+        for member in list(self.members.values()):
+            if member.proc.is_alive():
+                continue
+            logger.error(f'reader pool member {member.id} (pid: {member.proc.pid}) has died, it is being replaced')
+            with self.lock:
+                del self.members[member.id]
+            self.__add_member()
+            # the camera which has crashed the member can not be told apart, so all of them back off instead of a crash loop
+            for args in member.assigned.values():
+                self.__schedule(args, self.on_failed(args, RuntimeError(f'reader pool member {member.id} has died'), .0))
+
+    def __dispatch(self):
+        now = time.time()
+        with self.lock:
+            while len(self.delayed) > 0 and self.delayed[0][0] <= now:
+                self.pending.append(heapq.heappop(self.delayed)[2])
+            while len(self.pending) > 0:
+                member = min(self.members.values(), key=lambda m: len(m.assigned))
+                if len(member.assigned) >= self.capacity:
+                    break
+                args = self.pending.popleft()
+                self.next_token += 1
+                member.assigned[self.next_token] = args
+                member.tasks.put((self.next_token, args))
+                logger.info(f'camera ({args.name}) has been assigned to reader pool member {member.id}')
+            unplaced_count = len(self.pending)
+        # logged once per change instead of on every tick, the cameras wait until a member releases one of its cameras
+        if unplaced_count != self.unplaced_count:
+            self.unplaced_count = unplaced_count
+            if unplaced_count > 0:
+                logger.warning(f'{unplaced_count} camera(s) are waiting since the reader pool is full, its capacity is '
+                               f'{self.size * self.capacity} camera(s) (reader_pool_size * cameras_per_process)')
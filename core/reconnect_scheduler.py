@@ -0,0 +1,45 @@
+import random
+import time
+
+from common.utilities import logger, config
+from core.data.reconnect_repository import ReconnectRepository, ReconnectState
+from core.reader_args import ReaderArgs
+
+
+# decides how long a failed camera waits before it reconnects. The delay grows exponentially with the consecutive failures and is jittered,
+# so the cameras which fail together (i.e. a switch reboot) do not reconnect in the same second. If a camera fails max_retry times in
+# max_retry_in hours, it is parked until the oldest failure falls out of the window.
+class ReconnectScheduler:
+    def __init__(self, repository: ReconnectRepository):
+        self.repository = repository
+        self.max_retry = config.source_reader.max_retry
+        self.window = config.source_reader.max_retry_in * 3600.
+        self.base_delay = config.source_reader.reconnect_base_delay
+        self.max_delay = config.source_reader.reconnect_max_delay
+        self.stable_after = config.source_reader.reconnect_stable_after
+
+    def get_backoff(self, consecutive_failures: int) -> float:
+        backoff = min(self.max_delay, self.base_delay * 2 ** min(consecutive_failures - 1, 16))
+        # equal jitter: at least half of the backoff, the rest is random
+        return backoff / 2. + random.uniform(0, backoff / 2.)
+
+    # ran_for is how long the camera has been captured before it failed, a camera which has run long enough starts over
+    def on_failed(self, args: ReaderArgs, ran_for: float) -> float:
+        now = time.time()
+        state = self.repository.get(args.identifier)
+        if state is None:
+            state = ReconnectState(args.identifier, args.name)
+        state.consecutive_failures = 1 if ran_for >= self.stable_after else state.consecutive_failures + 1
+        state.failure_count += 1
+        count, oldest = self.repository.add_failure(args.identifier, now, self.window)
+        delay = self.get_backoff(state.consecutive_failures)
+        state.parked = 0 < self.max_retry <= count
+        if state.parked:
+            delay = max(delay, oldest + self.window - now + random.uniform(0, self.base_delay))
+            logger.warning(f'camera ({args.name}) has failed {count} times in {config.source_reader.max_retry_in} hours, it has been parked for {int(delay)}s')
+        state.failures_in_window = count
+        state.last_failed_at = now
+        state.next_retry_at = now + delay
+        self.repository.add(state)
+        logger.info(f'camera ({args.name}) will reconnect in {delay:.1f}s, consecutive failures: {state.consecutive_failures}')
+        return delay
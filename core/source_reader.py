@@ -7,29 +7,70 @@ import numpy as np
 import psutil
 import time
 from multiprocessing import Process
-import cv2
 from rq import Queue, Connection, Worker, Retry, get_current_job
 from rq.command import send_stop_job_command, send_kill_horse_command, send_shutdown_command
 from rq.job import Job
 from datetime import datetime
 import asyncio
-from typing import List
+from typing import Callable, List
 
 from common.data.service_repository import ServiceRepository
-from common.event_bus.event_bus import EventBus
-from common.utilities import logger, config, crate_redis_connection, RedisDb
+from common.data.source_model import RtspTransport
+from common.event_bus.event_bus import EventBus, get_publisher_pool
+from common.utilities import logger, config, crate_redis_connection, RedisDb, redis_pools
+from stream.stream_model import StreamModel
 from stream.stream_repository import StreamRepository
 from core.data.jober_repository import Jober, JoberRepository
+from core.bring_up import BringUpTracker
+from core.data.bring_up_repository import BringUpRepository, BringUpSlots
 from core.data.failed_repository import FailedRepository
-from core.sources import Cv2RtspSource, SourceBase
+from core.data.metrics_repository import MetricsRepository
+from core.data.profile_repository import ProfileRepository
+from core.data.reconnect_repository import ReconnectRepository
+from core.data.reader_version_repository import ReaderVersionRepository
+from core.encoder_pool import EncoderPool
+from core.encoders import EncoderBase, create_encoder
+from core.frame_batcher import FrameBatcher
+from core.frame_envelope import encode_envelope
+from core.frame_ring import FrameRingWriter, create_ring_name
+from core.metrics import CameraMetrics, MetricsReporter, get_rss, render_metrics
+from core.metrics_server import MetricsServer
+from core.motion_gate import MotionGate
+from core.profiler import StageProfiler
+from core.reader_args import ReaderArgs
+from core.reader_engine import ReaderEngine
+from core.reader_pool import ReaderPool
+from core.reconnect_scheduler import ReconnectScheduler
+from core.stream_watcher import StreamWatcher
+from core.sources import Cv2RtspSource, SourceBase, FFmpegPipeSource, LatestFrameSource
 
 _connection_main = crate_redis_connection(RedisDb.MAIN)
 _connection_rq = crate_redis_connection(RedisDb.RQ2)
 _queue = Queue(connection=_connection_rq)
 _stream_repository = StreamRepository(_connection_main)
+_service_repository = ServiceRepository(_connection_main)
 _jober_rep = JoberRepository(_connection_rq)
 _failed_rep = FailedRepository(_connection_rq)
+_reconnect_scheduler = ReconnectScheduler(ReconnectRepository(_connection_rq))
+_reader_versions = ReaderVersionRepository(_connection_rq)
 _event_bus = EventBus('read_service')
+_event_bus_binary = EventBus('read_service_binary')
+_event_bus_shm = EventBus('read_service_shm')
+_event_bus_stream = EventBus('read_service_stream')
+_event_bus_batch = EventBus('read_service_batch')
+_encoder_pool = EncoderPool(config.source_reader.encoder_pool_size, config.source_reader.cameras_per_process)
+_bring_up_rep = BringUpRepository(_connection_rq)
+_bring_up_slots = BringUpSlots(_connection_rq, config.source_reader.bring_up_concurrency, config.source_reader.bring_up_lease)
+# a batch has no camera, so the drop-oldest overflow policy drops the oldest pending batch
+_frame_batcher = FrameBatcher(lambda batch: _event_bus_batch.publish_async(batch, 'batch'), config.source_reader.batch_max_size,
+                              config.source_reader.batch_window_ms)
+_metrics = MetricsReporter(MetricsRepository(_connection_rq), config.source_reader.metrics_flush_interval, config.source_reader.metrics_enabled,
+                           get_publisher_pool(), _encoder_pool)
+_profiler = StageProfiler(ProfileRepository(_connection_rq), config.source_reader.profiler_enabled, config.source_reader.profiler_sample_every,
+                          config.source_reader.profiler_flush_interval, config.source_reader.profiler_commands_enabled,
+                          config.source_reader.profiler_command_check_interval, config.source_reader.profiler_max_capture_duration,
+                          get_publisher_pool())
+_reader_pool = {'pool': None}
 _checker_job_pid = {'pid': -1}
 
 
@@ -43,45 +84,281 @@ def _close_stream(source: SourceBase, name: str, rtsp_type: int):
     logger.error(f'camera ({name}) has been stopped and it should work again with retry')
 
 
-def _publish(img: np.array, name: str, identifier: str, ai_clip_enabled: bool):
-    img_str = base64.b64encode(cv2.imencode('.jpg', img)[1]).decode()
-    dic = {'name': name, 'img': img_str, 'source': identifier, 'ai_clip_enabled': ai_clip_enabled}
-    _event_bus.publish_async(json.dumps(dic, ensure_ascii=False, indent=4))
-    logger.info(f'camera ({name}) -> an image has been send to broker at {datetime.now()}')
+def _publish(img: np.array, args: ReaderArgs, sequence: int, ring_writer: FrameRingWriter, encoder: EncoderBase, metrics: CameraMetrics,
+             sampled: bool):
+    timestamp = time.time()
+    accepted = True
+    if ring_writer is not None:
+        slot = ring_writer.write(img, timestamp, sequence)
+        dic = {'name': args.name, 'source': args.identifier, 'ai_clip_enabled': args.ai_clip_enabled, 'shm': ring_writer.name,
+               'generation': ring_writer.get_generation(), 'slot': slot, 'sequence': sequence, 'timestamp': timestamp, 'width': img.shape[1],
+               'height': img.shape[0]}
+        accepted &= _event_bus_shm.publish_async(json.dumps(dic, ensure_ascii=False), args.identifier)
+    publish_json, publish_binary = config.source_reader.publish_json, config.source_reader.publish_binary
+    streams_enabled, batch_enabled = config.source_reader.streams_enabled, config.source_reader.batch_enabled
+    if publish_json or publish_binary or streams_enabled or batch_enabled:
+        buff = encoder.encode(img)
+        encoded_at = time.perf_counter()
+        encode_time = encoder.last_encode_time
+        metrics.observe('encode', encode_time)
+        metrics.published_bytes += len(buff)
+        serialize_time = .0
+        if publish_json:
+            img_str = base64.b64encode(buff).decode()
+            dic = {'name': args.name, 'img': img_str, 'source': args.identifier, 'ai_clip_enabled': args.ai_clip_enabled, 'format': encoder.format}
+            event = json.dumps(dic, ensure_ascii=False)
+            serialize_time += time.perf_counter() - encoded_at
+            accepted &= _event_bus.publish_async(event, args.identifier)
+        if publish_binary or batch_enabled:
+            started_at = time.perf_counter()
+            envelope = encode_envelope(args.identifier, args.name, args.ai_clip_enabled, timestamp, sequence, buff, encoder.format)
+            serialize_time += time.perf_counter() - started_at
+            if publish_binary:
+                accepted &= _event_bus_binary.publish_async(envelope, args.identifier)
+            if batch_enabled:
+                _frame_batcher.add(envelope)
+        if streams_enabled:
+            # the stream entries are binary safe, so the image is not base64 encoded
+            fields = {'name': args.name, 'source': args.identifier, 'ai_clip_enabled': int(args.ai_clip_enabled), 'format': encoder.format,
+                      'timestamp': timestamp, 'sequence': sequence, 'img': bytes(buff)}
+            accepted &= _event_bus_stream.add_async(fields, args.identifier, config.source_reader.streams_max_len,
+                                                    config.source_reader.streams_shard_count)
+        if sampled:
+            _profiler.record(args.identifier, 'encode', encode_time)
+            _profiler.record(args.identifier, 'serialize', serialize_time)
+    if accepted:
+        metrics.published_count += 1
+    else:
+        metrics.dropped_count += 1
+    logger.info(f'camera ({args.name}) -> an image has been send to broker at {datetime.now()}')
+
+
+def _log_capture_stats(source: SourceBase, gate: MotionGate, name: str):
+    skipped = gate.skipped_count if gate is not None else 0
+    logger.info(f'camera ({name}) -> grabbed: {source.grabbed_count}, decoded: {source.decoded_count}, skipped by motion gate: {skipped}')
+
+
+def _is_current(args: ReaderArgs, version: str) -> bool:
+    if not config.source_reader.hot_reload_enabled:
+        return True
+    try:
+        return _reader_versions.get(args.identifier) == version
+    except BaseException as e:
+        logger.error(f'an error occurred while checking the version of camera ({args.name}), err: {e}')
+        return True
+
+
+# returns True if the camera has been stopped since it has been removed or reconfigured. create_source replaces the rtsp sources,
+# i.e. by the benchmark
+def _capture(args: ReaderArgs, create_source: Callable[[ReaderArgs], SourceBase] = None) -> bool:
+    version = args.get_version()
+    if not _is_current(args, version):
+        return True
+    _mark_running(args, version, True)
+    ring_writer = None
+    if config.source_reader.shm_enabled:
+        ring_writer = FrameRingWriter(create_ring_name(args.identifier), config.source_reader.shm_slot_count)
+    _profiler.register(args)
+    try:
+        stopped = _capture_frames(args, ring_writer, create_source if create_source is not None else _create_source)
+        if stopped:
+            _metrics.remove(args.identifier)
+        return stopped
+    finally:
+        _profiler.unregister(args)
+        # waits for the frame which is being published on an encoder thread, since it writes into the ring
+        _encoder_pool.discard(args.identifier)
+        if ring_writer is not None:
+            ring_writer.close()
+        _mark_running(args, version, False)
+
+
+def _mark_running(args: ReaderArgs, version: str, running: bool):
+    try:
+        if running:
+            _reader_versions.set_running(args.identifier, version)
+        else:
+            _reader_versions.remove_running(args.identifier, version)
+    except BaseException as e:
+        logger.error(f'an error occurred while marking camera ({args.name}) as {"running" if running else "exited"}, err: {e}')
+
+
+def _create_source(args: ReaderArgs) -> SourceBase:
+    if config.source_reader.ffmpeg_pipe_enabled and args.width > 0 and args.height > 0:
+        source = FFmpegPipeSource(args.name, args.rtsp_address, args.width, args.height, RtspTransport(args.rtsp_transport), args.probe_size,
+                                  args.analyzation_duration, config.source_reader.ffmpeg_pipe_threads, config.source_reader.ffmpeg_pipe_lowres,
+                                  config.source_reader.ffmpeg_pipe_timeout)
+    else:
+        source = Cv2RtspSource(args.name, args.rtsp_address, args.width, args.height)
+        source.set_buffer_size(args.buffer_size)
+    if config.source_reader.latest_frame_enabled:
+        return LatestFrameSource(source, args.name, config.source_reader.latest_frame_decode_all)
+    return source
+
+
+def _get_rtsp_type(source: SourceBase) -> int:
+    if isinstance(source, LatestFrameSource):
+        source = source.source
+    return 1 if isinstance(source, FFmpegPipeSource) else 0
+
+
+def _capture_frames(args: ReaderArgs, ring_writer: FrameRingWriter, create_source: Callable[[ReaderArgs], SourceBase]) -> bool:
+    version = args.get_version()
+    bring_up = BringUpTracker(args, _bring_up_slots, _bring_up_rep, lambda: _is_current(args, version),
+                              config.source_reader.hot_reload_check_interval)
+    if not bring_up.begin():
+        return True
+    try:
+        source = create_source(args)
+        bring_up.on_opened()
+        return _capture_source(args, source, ring_writer, bring_up)
+    finally:
+        bring_up.end()
+
+
+def _capture_source(args: ReaderArgs, source: SourceBase, ring_writer: FrameRingWriter, bring_up: BringUpTracker) -> bool:
+    encoder = create_encoder(args)
+    metrics = _metrics.get(args)
+    metrics.encoder = encoder.name
+    latest_frame_source = source if isinstance(source, LatestFrameSource) else None
+    rtsp_type = _get_rtsp_type(source)
+    gate = MotionGate(args, config.source_reader.motion_gate_max_silence) if config.source_reader.motion_gate_enabled else None
+    grab_only = config.source_reader.grab_only
+    encoder_pool_enabled = config.source_reader.encoder_pool_enabled
+    stats_interval = config.source_reader.stats_interval
+    version = args.get_version()
+    version_check_interval = config.source_reader.hot_reload_check_interval
+    profiling = False
+    prev = 0
+    sequence = 0
+    prev_stats = time.time()
+    prev_version_check = prev_stats
+    logger.info(f"cv2 source has been opened, capturing will be starting now, camera no:  {args.name}, url: {args.rtsp_address}")
+    while not source.is_closed():
+        now = time.time()
+        if now - prev_stats > stats_interval:
+            prev_stats = now
+            _log_capture_stats(source, gate, args.name)
+        if now - prev_version_check > version_check_interval:
+            prev_version_check = now
+            if not _is_current(args, version):
+                logger.warning(f'camera ({args.name}) has been removed or reconfigured, its reader is being stopped')
+                _close_stream(source, args.name, rtsp_type)
+                return True
+            _profiler.check_capture(args)
+            was_profiling, profiling = profiling, _profiler.begin_capture(args)
+            if profiling and not was_profiling:
+                _encoder_pool.discard(args.identifier)  # no frame of the camera is being encoded by the pool meanwhile
+        is_due = now - prev > 1. / args.fps
+        if grab_only and not is_due:
+            # the frame is not going to be published, so there is no need to decode it
+            started_at = time.perf_counter()
+            if not source.grab():
+                _close_stream(source, args.name, rtsp_type)
+                break
+            metrics.observe('grab', time.perf_counter() - started_at)
+            metrics.grabbed_count += 1
+            continue
+        started_at = time.perf_counter()
+        if not source.grab():
+            _close_stream(source, args.name, rtsp_type)
+            break
+        grabbed_at = time.perf_counter()
+        img = source.retrieve()
+        if img is None:
+            _close_stream(source, args.name, rtsp_type)
+            break
+        decoded_at = time.perf_counter()
+        metrics.observe('grab', grabbed_at - started_at)
+        metrics.observe('decode', decoded_at - grabbed_at)
+        metrics.grabbed_count += 1
+        metrics.decoded_count += 1
+        metrics.last_frame_at = time.time()
+        if latest_frame_source is not None:
+            metrics.observe('frame_age', latest_frame_source.last_frame_age)
+        if not bring_up.completed:
+            bring_up.on_first_frame()
+        if is_due:
+            prev = time.time()
+            sampled = _profiler.sample(args.identifier)
+            if sampled:
+                _profiler.record(args.identifier, 'read', decoded_at - started_at)
+            if gate is not None and not gate.should_publish(img):
+                continue
+            sequence += 1
+            # a profiled camera publishes on its capture thread, so that the profile covers the encoding as well
+            if encoder_pool_enabled and not profiling:
+                # the capture cadence does not depend on the encoding cost
+                if not _encoder_pool.submit(args.identifier, _publish, img, args, sequence, ring_writer, encoder, metrics, sampled):
+                    metrics.dropped_count += 1
+            else:
+                _publish(img, args, sequence, ring_writer, encoder, metrics, sampled)
+    _log_capture_stats(source, gate, args.name)
+    return False
+
+
+def _add_jober(me_job: Job, args_list: List[ReaderArgs], ex: BaseException):
+    model = Jober()
+    model.job_id = me_job.id
+    model.worker_name = me_job.worker_name
+    model.worker_pid = os.getpid()
+    model.starter_pid = psutil.Process(os.getpid()).ppid()
+    model.args = ReaderArgs.to_json(args_list)
+    model.exception_msg = str(ex) if ex is not None else ''
+    _jober_rep.add(model)
+
+
+def _get_reconnect_delay(args: ReaderArgs, ran_for: float) -> float:
+    try:
+        return _reconnect_scheduler.on_failed(args, ran_for)
+    except BaseException as e:
+        logger.error(f'an error occurred while scheduling the reconnection of camera ({args.name}), err: {e}')
+        return 5.
 
 
-def _read(fps: int, buffer_size: int, identifier: str, name: str, rtsp_address: str, width: int, height: int, ai_clip_enabled: bool):
+def _read(args: ReaderArgs):
     me_job = get_current_job()
     ex = None
+    stopped = False
+    started_at = time.time()
     try:
-        source = Cv2RtspSource(name, rtsp_address, width, height)
-        source.set_buffer_size(buffer_size)
-        prev = 0
-        logger.info(f"cv2 source has been opened, capturing will be starting now, camera no:  {name}, url: {rtsp_address}")
-        while not source.is_closed():
-            time_elapsed = time.time() - prev
-            img = source.get_img()
-            if img is None:
-                _close_stream(source, name, 0)
-                break
-            if time_elapsed > 1. / fps:
-                prev = time.time()
-                _publish(img, name, identifier, ai_clip_enabled)
+        stopped = _capture(args)
+    except BaseException as e:
+        ex = e
+    finally:
+        if not stopped:
+            # a parked camera sleeps here until its retry budget allows it to reconnect
+            time.sleep(_get_reconnect_delay(args, time.time() - started_at))
+            _add_jober(me_job, [args], ex)
+            _failed_rep.add_read(args.name, args.rtsp_address)
+
+
+def _on_capture_failed(args: ReaderArgs, ex: BaseException, ran_for: float) -> float:
+    _failed_rep.add_read(args.name, args.rtsp_address)
+    return _get_reconnect_delay(args, ran_for)
+
+
+# a failed camera is restarted by its own thread, the jober is added only if the whole process fails.
+# the engine returns only after all cameras have been stopped on purpose
+def _read_many(args_list: List[ReaderArgs]):
+    me_job = get_current_job()
+    ex = None
+    completed = False
+    try:
+        ReaderEngine(_capture, _on_capture_failed).run(args_list)
+        completed = True
     except BaseException as e:
         ex = e
     finally:
-        # todo: do not add if a camera has been failed more than max specified
-        # todo: implement it with them -> self.source_reader.max_retry: int = 150, self.source_reader.max_retry_in: int = 6  # hours
-        time.sleep(5)
-        model = Jober()
-        model.job_id = me_job.id
-        model.worker_name = me_job.worker_name
-        model.worker_pid = os.getpid()
-        model.starter_pid = psutil.Process(os.getpid()).ppid()
-        model.args = f'{fps}º{buffer_size}º{identifier}º{name}º{rtsp_address}º{width}º{height}º{ai_clip_enabled}'
-        model.exception_msg = str(ex) if ex is not None else ''
-        _jober_rep.add(model)
-        _failed_rep.add_read(name, rtsp_address)
+        if not completed:
+            time.sleep(5)
+            _add_jober(me_job, args_list, ex)
+
+
+def _enqueue_read(args_list: List[ReaderArgs]) -> Job:
+    if len(args_list) == 1:
+        return _queue.enqueue(_read, args_list[0], job_timeout=-1)
+    return _queue.enqueue(_read_many, args_list, job_timeout=-1)
 
 
 def _start_worker():
@@ -89,48 +366,61 @@ def _start_worker():
     worker.work(burst=True)
 
 
+# the workers are started without waiting for each other, the concurrency of opening the captures is limited by the bring-up slots
 def _start_workers(jobs: List[Job]):
     logger.info(f'jobs count: {len(jobs)}')
+    interval = config.source_reader.worker_start_interval
     with Connection(connection=_connection_rq):
         for _ in jobs:
             proc = Process(target=_start_worker)
             # proc.daemon = daemon
             proc.start()
-            time.sleep(1)
+            if interval > 0:
+                time.sleep(interval)
+
+
+def _restart_failed(failed: Jober):
+    logger.info(f'failed job has been detected, id: {failed.job_id}')
+
+    try:
+        pid = int(failed.starter_pid)
+        p = psutil.Process(pid)
+        p.terminate()
+        time.sleep(1)
+        logger.info(f'starter process has been killed, pid: {pid}')
+    except BaseException as ex:
+        logger.error(f'error while killing starter process command, job {failed.job_id}, err: {ex}')
+
+    try:
+        _jober_rep.remove(failed)
+    except BaseException as ex:
+        logger.error(f'error while removing jober, job {failed.job_id}, err: {ex}')
 
+    try:
+        job = _enqueue_read(ReaderArgs.from_json(failed.args))
+        _start_workers([job])
+    except BaseException as ex:
+        logger.error(f'error while requeue job {failed.job_id}, err: {ex}')
 
+
+# reacts to a failed job as soon as it is pushed. The jober keys are scanned only when nothing happens during the reconcile interval,
+# which catches a jober whose notification has been lost (i.e. the supervisor has been restarted meanwhile).
 def _check_workers():
     _checker_job_pid['pid'] = os.getpid()
+    reconcile_interval = config.source_reader.supervisor_reconcile_interval
     while 1:
+        job_id = _jober_rep.wait_failed(reconcile_interval)
+        if job_id is not None:
+            failed = _jober_rep.get(job_id)
+            if failed is not None:  # otherwise it has already been handled by a reconcile
+                _restart_failed(failed)
+            continue
         not_working_jobs = _jober_rep.get_all()
         if len(not_working_jobs) > 0:
             for failed in not_working_jobs:
-                logger.info(f'failed job has been detected, id: {failed.job_id}')
-
-                try:
-                    pid = int(failed.starter_pid)
-                    p = psutil.Process(pid)
-                    p.terminate()
-                    time.sleep(1)
-                    logger.info(f'starter process has been killed, pid: {pid}')
-                except BaseException as ex:
-                    logger.error(f'error while killing starter process command, job {failed.job_id}, err: {ex}')
-
-                try:
-                    _jober_rep.remove(failed)
-                except BaseException as ex:
-                    logger.error(f'error while removing jober, job {failed.job_id}, err: {ex}')
-
-                try:
-                    args = failed.args.split('º')
-                    job = _queue.enqueue(_read, int(args[0]), int(args[1]), args[2], args[3], args[4], int(args[5]), int(args[6]), bool(args[7]),
-                                         job_timeout=-1)
-                    _start_workers([job])
-                except BaseException as ex:
-                    logger.error(f'error while requeue job {failed.job_id}, err: {ex}')
+                _restart_failed(failed)
         else:
             logger.info(f'No failed jobs at {datetime.utcnow()}')
-        time.sleep(1)
 
 
 def _add_checker_job():
@@ -143,41 +433,56 @@ def _delete_all():
     _connection_rq.flushdb()
 
 
-def _init_cameras() -> (List[Job], BaseException):
-    def get_address(s):
-        if len(s.ms_address) == 0:
-            return s.address
-        ffmpeg_service = ServiceRepository(_connection_main).get('ffmpeg_service', 'cv2_read_service-instance')
-        if ffmpeg_service is None:
-            return s.address
-        ffmpeg_service_ip = ffmpeg_service.ip_address
-        if len(ffmpeg_service_ip) == 0:
-            return s.address
-        return s.ms_address.replace('127.0.0.1', ffmpeg_service_ip)
-
-    jobs: List[Job] = []
-    err = None
-    try:
-        streams = _stream_repository.get_all()
-        for stream in streams:
-            if not stream.is_opencv_persistent_snapshot_enabled():
+def _get_address(s: StreamModel, service_repository: ServiceRepository) -> str:
+    if len(s.ms_address) == 0:
+        return s.address
+    ffmpeg_service = service_repository.get('ffmpeg_service', 'cv2_read_service-instance')
+    if ffmpeg_service is None:
+        return s.address
+    ffmpeg_service_ip = ffmpeg_service.ip_address
+    if len(ffmpeg_service_ip) == 0:
+        return s.address
+    return s.ms_address.replace('127.0.0.1', ffmpeg_service_ip)
+
+
+def _load_reader_args(verbose: bool = True) -> List[ReaderArgs]:
+    args_list: List[ReaderArgs] = []
+    streams = _stream_repository.get_all()
+    for stream in streams:
+        if not stream.is_opencv_persistent_snapshot_enabled():
+            if verbose:
                 logger.warning(f"id ({stream.id}) name ({stream.name}) persistent reader was not enabled.")
-                continue
-            fps = stream.snapshot_frame_rate
-            if fps == 0:
+            continue
+        fps = stream.snapshot_frame_rate
+        if fps == 0:
+            if verbose:
                 logger.warning(f"id ({stream.id}) name ({stream.name}) persistent reader was not enabled since fps was set to zero.")
-                continue
-            rtsp_address = get_address(stream)
-            if len(rtsp_address) == 0:
+            continue
+        rtsp_address = _get_address(stream, _service_repository)
+        if len(rtsp_address) == 0:
+            if verbose:
                 logger.warning(f"id ({stream.id}) name ({stream.name}) has no valid address.")
-                continue
+            continue
+        args_list.append(ReaderArgs.create(stream, rtsp_address, config.source_reader.buffer_size))
+    return args_list
+
 
-            name = stream.name
-            buffer_size = config.source_reader.buffer_size
-            job = _queue.enqueue(_read, fps, buffer_size, stream.id, name, rtsp_address, stream.snapshot_width, stream.snapshot_height, stream.ai_clip_enabled,
-                                 job_timeout=-1)
-            logger.warning(f"id ({stream.id}) name ({stream.name}) address ({rtsp_address}) has been queued.")
-            jobs.append(job)
+def _register_reader_args() -> List[ReaderArgs]:
+    args_list = _load_reader_args()
+    _reader_versions.set_all({args.identifier: args.get_version() for args in args_list})
+    for args in args_list:
+        logger.warning(f"id ({args.identifier}) name ({args.name}) address ({args.rtsp_address}) has been queued.")
+    return args_list
+
+
+def _init_cameras() -> (List[Job], BaseException):
+    jobs: List[Job] = []
+    err = None
+    try:
+        args_list = _register_reader_args()
+        cameras_per_process = max(1, config.source_reader.cameras_per_process)
+        for j in range(0, len(args_list), cameras_per_process):
+            jobs.append(_enqueue_read(args_list[j:j + cameras_per_process]))
     except BaseException as ex:
         logger.error(ex)
         err = ex
@@ -186,6 +491,64 @@ def _init_cameras() -> (List[Job], BaseException):
     return jobs, err
 
 
+# the cameras are handed over to the pre-forked members instead of a new rq worker process per job
+def _init_reader_pool() -> BaseException:
+    try:
+        args_list = _register_reader_args()
+        pool = ReaderPool(config.source_reader.reader_pool_size, config.source_reader.cameras_per_process, _capture, _on_capture_failed)
+        capacity = pool.size * pool.capacity
+        if len(args_list) > capacity:
+            logger.warning(f'the reader pool can read {capacity} of {len(args_list)} camera(s) at once, the rest will wait for a free slot, '
+                           f'reader_pool_size or cameras_per_process should be increased')
+        pool.start()
+        _reader_pool['pool'] = pool
+        for args in args_list:
+            pool.assign(args)
+        logger.info('all cameras have been assigned to the reader pool')
+        return None
+    except BaseException as ex:
+        logger.error(ex)
+        return ex
+
+
+def _start_reader(args: ReaderArgs):
+    pool = _reader_pool['pool']
+    if pool is not None:
+        pool.assign(args)
+    else:
+        _start_workers([_enqueue_read([args])])
+
+
+def _start_stream_watcher():
+    interval = config.source_reader.hot_reload_interval
+    restart_timeout = config.source_reader.hot_reload_restart_timeout
+    StreamWatcher(_connection_main, _reader_versions, lambda: _load_reader_args(False), _start_reader, interval, restart_timeout).start()
+    logger.info('stream watcher has been started')
+
+
+def _render_metrics() -> str:
+    main_process = psutil.Process(os.getpid())
+    # the rq workers, the pool members and the ffmpeg processes are all descendants of the main process
+    processes = [main_process] + main_process.children(recursive=True)
+    service = [('processes', 'processes of the service including the main one', len(processes)),
+               ('rss_bytes', 'resident memory of the service including all of its processes', sum(get_rss(p.pid) for p in processes)),
+               ('rq_queue_jobs', 'jobs waiting in the rq queue', len(_queue)),
+               ('cameras_configured', 'cameras which should be running', len(_reader_versions.get_all())),
+               ('redis_connections', 'redis connections opened by the main process', redis_pools.get_connection_count())]
+    repository = _metrics.repository
+    return render_metrics(repository.get_all(), repository.get_processes(), _reconnect_scheduler.repository.get_all(), service)
+
+
+def _start_metrics_server() -> MetricsServer:
+    server = MetricsServer(config.source_reader.metrics_host, config.source_reader.metrics_port, _render_metrics)
+    try:
+        server.start()
+    except BaseException as ex:
+        logger.error(f'metrics endpoint could not be started, err: {ex}')
+        return None
+    return server
+
+
 def _kill_process(op: str, pid: int):
     try:
         if psutil.pid_exists(pid):
@@ -219,19 +582,33 @@ def _kill_all_previous_jobs():
 def start():
     _kill_all_previous_jobs()
     _delete_all()
+    metrics_server = None
     try:
-        service_repository = ServiceRepository(_connection_main)
-        service_repository.add('cv2_read_service', 'cv2_read_service-instance', 'The OpenCV Persistent Reader Service®')
-        checker_job = _add_checker_job()
-        _start_workers([checker_job])
-        jobs, err = _init_cameras()
-        if err is not None:
-            logger.error(f'error while initializing cameras: {err}, the operation will be terminated')
-            return
-        _start_workers(jobs)
+        _service_repository.add('cv2_read_service', 'cv2_read_service-instance', 'The OpenCV Persistent Reader Service®')
+        if config.source_reader.reader_pool_size > 0:
+            err = _init_reader_pool()
+            if err is not None:
+                logger.error(f'error while initializing the reader pool: {err}, the operation will be terminated')
+                return
+        else:
+            checker_job = _add_checker_job()
+            _start_workers([checker_job])
+            jobs, err = _init_cameras()
+            if err is not None:
+                logger.error(f'error while initializing cameras: {err}, the operation will be terminated')
+                return
+            _start_workers(jobs)
+        if config.source_reader.hot_reload_enabled:
+            _start_stream_watcher()
+        if config.source_reader.metrics_enabled:
+            metrics_server = _start_metrics_server()
         loop = asyncio.get_event_loop()
         loop.run_forever()
     finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        if _reader_pool['pool'] is not None:
+            _reader_pool['pool'].stop()
         _kill_all_previous_jobs()
         _kill_process('checker job', _checker_job_pid['pid'])
         _delete_all()
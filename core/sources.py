@@ -1,19 +1,43 @@
 import os
 import queue
+import select
+import subprocess
 import threading
+import time
 from abc import ABC, abstractmethod
+from typing import List
 import cv2
 import numpy as np
 
+from common.data.source_model import RtspTransport
 from common.utilities import logger, config
 
 
 class SourceBase(ABC):
+    # the frames which have been grabbed and decoded so far, a source which splits grab and retrieve counts them on its own
+    grabbed_count: int = 0
+    decoded_count: int = 0
+    pending_img: np.array = None
 
     @abstractmethod
     def get_img(self) -> np.array:
         pass
 
+    # grab and retrieve are built on get_img for a source which can not skip the decoding, so the frame is decoded while it is grabbed
+    def grab(self) -> bool:
+        self.pending_img = self.get_img()
+        if self.pending_img is None:
+            return False
+        self.grabbed_count += 1
+        return True
+
+    def retrieve(self) -> np.array:
+        img = self.pending_img
+        self.pending_img = None
+        if img is not None:
+            self.decoded_count += 1
+        return img
+
     @abstractmethod
     def is_closed(self) -> bool:
         pass
@@ -95,6 +119,8 @@ class Cv2RtspSource(SourceBase):
         self.dim = (width, height)
         self.timeout = 10
         self.is_capturing_working = True
+        self.grabbed_count: int = 0
+        self.decoded_count: int = 0
         self.cam = self.get_video_capture()  # cv2.VideoCapture(rtsp_address)
         self.resize_img = config.source_reader.resize_img
         self.set_open_cv_size()
@@ -125,9 +151,33 @@ class Cv2RtspSource(SourceBase):
         if not succeed or numpy_img is None:
             logger.error(f'camera ({self.name}) could not capture any frame and is now being released')
             return None
-        else:
-            # cv2.resize costs too much CPU time
-            return numpy_img if not self.resize_img else cv2.resize(numpy_img, self.dim, interpolation=cv2.INTER_AREA)
+        self.grabbed_count += 1
+        self.decoded_count += 1
+        return self._resize(numpy_img)
+
+    # grabs the next frame without decoding it, retrieve() decodes the last grabbed one
+    def grab(self) -> bool:
+        if not self.is_capturing_working:
+            return False
+        if not self.cam.grab():
+            logger.error(f'camera ({self.name}) could not grab any frame and is now being released')
+            return False
+        self.grabbed_count += 1
+        return True
+
+    def retrieve(self) -> np.array:
+        if not self.is_capturing_working:
+            return None
+        succeed, numpy_img = self.cam.retrieve()
+        if not succeed or numpy_img is None:
+            logger.error(f'camera ({self.name}) could not decode the grabbed frame and is now being released')
+            return None
+        self.decoded_count += 1
+        return self._resize(numpy_img)
+
+    def _resize(self, numpy_img: np.array) -> np.array:
+        # cv2.resize costs too much CPU time
+        return numpy_img if not self.resize_img else cv2.resize(numpy_img, self.dim, interpolation=cv2.INTER_AREA)
 
     def is_closed(self) -> bool:
         return not self.cam.isOpened()
@@ -138,3 +188,214 @@ class Cv2RtspSource(SourceBase):
     def set_open_cv_size(self):
         self.cam.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
         self.cam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+
+# decodes the stream with an ffmpeg process, so the frames come out of the decoder already scaled to width x height.
+# unlike CAP_PROP_FRAME_WIDTH/HEIGHT, it works for the network streams and the per-stream input options are applied as well.
+class FFmpegPipeSource(SourceBase):
+    def __init__(self, name: str, address: str, width: int, height: int, rtsp_transport: RtspTransport = RtspTransport.Auto, probe_size: int = 0,
+                 analyzation_duration: int = 0, threads: int = 0, lowres: int = 0, timeout: float = 10.):
+        self.name = name
+        self.address = address
+        self.width: int = width
+        self.height: int = height
+        self.frame_size = width * height * 3
+        self.grabbed_count: int = 0
+        self.decoded_count: int = 0
+        self.last_frame: bytearray | None = None
+        self.closed = False
+        self.timeout = timeout  # a stalled stream which does not close the socket is released after it
+        args = FFmpegPipeSource.create_args(address, width, height, rtsp_transport, probe_size, analyzation_duration, threads, lowres, timeout)
+        # unbuffered, so a readinto is a single read which returns what is available after select
+        self.proc = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        th = threading.Thread(target=self.__log_stderr)
+        th.daemon = True
+        th.start()
+        logger.info(f'camera ({name}) ffmpeg pipe source has been started, frame size: {width}x{height}')
+
+    @staticmethod
+    def create_args(address: str, width: int, height: int, rtsp_transport: RtspTransport, probe_size: int, analyzation_duration: int, threads: int,
+                    lowres: int, timeout: float = 0) -> List[str]:
+        args = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin']
+        io_timeout = str(int(timeout * 1000000))  # microseconds
+        if address.startswith('rtsp://'):
+            transport = RtspTransport.str(rtsp_transport)
+            if len(transport) > 0:
+                args += ['-rtsp_transport', transport]
+            if timeout > 0:
+                args += ['-timeout', io_timeout]
+        elif timeout > 0:
+            args += ['-rw_timeout', io_timeout]
+        if probe_size > 0:
+            args += ['-probesize', str(probe_size)]
+        if analyzation_duration > 0:
+            args += ['-analyzeduration', str(analyzation_duration)]
+        if threads > 0:
+            args += ['-threads', str(threads)]
+        if lowres > 0:
+            args += ['-lowres', str(lowres)]
+        args += ['-i', address, '-an', '-sn', '-vf', f'scale={width}:{height}', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+        return args
+
+    def __log_stderr(self):
+        try:
+            for line in iter(self.proc.stderr.readline, b''):
+                logger.error(f'camera ({self.name}) ffmpeg: {line.decode("utf-8", "replace").rstrip()}')
+        except BaseException as ex:
+            logger.info(f'camera ({self.name}) ffmpeg stderr has been closed, err: {ex}')
+
+    def set_buffer_size(self, size: int):
+        pass  # the pipe is drained frame by frame
+
+    # reads the raw frame, but it is turned into an image only by retrieve()
+    def grab(self) -> bool:
+        if self.closed:
+            return False
+        frame = bytearray(self.frame_size)
+        view = memoryview(frame)
+        read = 0
+        deadline = time.time() + self.timeout if self.timeout > 0 else None
+        while read < self.frame_size:
+            if deadline is not None:
+                ready, _, _ = select.select([self.proc.stdout], [], [], max(deadline - time.time(), 0))
+                if len(ready) == 0:
+                    # ffmpeg's own input timeout does not cover a stalled decoder, so the process is killed
+                    logger.error(f'camera ({self.name}) ffmpeg pipe has not delivered a frame in {self.timeout}s and is now being released')
+                    self.proc.kill()
+                    return False
+            n = self.proc.stdout.readinto(view[read:])
+            if not n:
+                logger.error(f'camera ({self.name}) ffmpeg pipe has been closed and is now being released')
+                return False
+            read += n
+        self.last_frame = frame
+        self.grabbed_count += 1
+        return True
+
+    def retrieve(self) -> np.array:
+        if self.last_frame is None:
+            return None
+        # every frame has its own buffer, so the image can be handed over to another thread
+        numpy_img = np.frombuffer(self.last_frame, dtype=np.uint8).reshape((self.height, self.width, 3))
+        self.last_frame = None
+        self.decoded_count += 1
+        return numpy_img
+
+    def get_img(self) -> np.array:
+        if not self.grab():
+            return None
+        return self.retrieve()
+
+    def is_closed(self) -> bool:
+        return self.closed or self.proc.poll() is not None
+
+    def close(self):
+        self.closed = True
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        finally:
+            self.proc.stdout.close()
+            self.proc.stderr.close()
+
+
+# drains the wrapped source on a grabber thread all the time, so the frames can not pile up in the decoder's buffer when the capture loop
+# falls behind (CAP_PROP_BUFFERSIZE is ignored by many FFmpeg builds). Only the newest frame is kept in a single slot. By default a frame is
+# decoded only when it is asked for, which is the next grabbed one, decode_all decodes every frame instead so that it is ready at once.
+# grab() waits for the next frame grabbed by the thread, so the capture loop keeps the pace of the stream
+class LatestFrameSource(SourceBase):
+    def __init__(self, source: SourceBase, name: str, decode_all: bool = False, timeout: float = 10.):
+        self.source = source
+        self.name = name
+        self.decode_all = decode_all
+        self.timeout = timeout
+        self.grabbed_count: int = 0
+        self.decoded_count: int = 0
+        self.last_frame_age: float = .0  # seconds between the grab of the last retrieved frame and its retrieval
+        self.changed = threading.Condition()
+        self.frame: np.array = None
+        self.frame_grabbed_at = .0
+        self.decode_requested = False
+        self.stopped = False
+        self.failed = False
+        self.exited = False
+        self.close_requested = False  # the grabber thread releases the source when it exits
+        self.thread = threading.Thread(target=self.__grab_frames)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __grab_frames(self):
+        try:
+            while not self.stopped:
+                if not self.source.grab():
+                    break
+                grabbed_at = time.time()
+                with self.changed:
+                    decode = self.decode_all or self.decode_requested
+                img = self.source.retrieve() if decode else None
+                if decode and img is None:
+                    break
+                with self.changed:
+                    self.grabbed_count += 1
+                    if img is not None:
+                        self.frame, self.frame_grabbed_at = img, grabbed_at
+                        self.decoded_count += 1
+                        self.decode_requested = False
+                    self.changed.notify_all()
+        except BaseException as ex:
+            logger.error(f'camera ({self.name}) grabber thread has been failed, err: {ex}')
+        finally:
+            with self.changed:
+                self.failed = True
+                self.exited = True
+                close = self.close_requested
+                self.changed.notify_all()
+            if close:
+                self.__close_source()
+
+    def grab(self) -> bool:
+        with self.changed:
+            count = self.grabbed_count
+            self.changed.wait_for(lambda: self.grabbed_count != count or self.failed, self.timeout)
+            return self.grabbed_count != count
+
+    def retrieve(self) -> np.array:
+        with self.changed:
+            if not self.decode_all:
+                self.frame = None
+                self.decode_requested = True
+            self.changed.wait_for(lambda: self.frame is not None or self.failed, self.timeout)
+            img, grabbed_at = self.frame, self.frame_grabbed_at
+            self.frame = None
+        if img is None:
+            logger.error(f'camera ({self.name}) could not get any frame from the grabber thread and is now being released')
+            return None
+        self.last_frame_age = time.time() - grabbed_at
+        return img
+
+    def get_img(self) -> np.array:
+        return self.retrieve()
+
+    def set_buffer_size(self, size: int):
+        self.source.set_buffer_size(size)
+
+    def is_closed(self) -> bool:
+        return self.failed or self.source.is_closed()
+
+    # the wrapped source is not thread-safe, so it is released only after the grabber thread has left it. If the thread is still blocked
+    # in the source (i.e. a stalled stream), it is left to the thread to release the source when it exits
+    def close(self):
+        self.stopped = True
+        self.thread.join(self.timeout)
+        with self.changed:
+            if not self.exited:
+                self.close_requested = True
+                logger.warning(f'camera ({self.name}) grabber thread has not exited in {self.timeout}s, it will release the source when it does')
+                return
+        self.__close_source()
+
+    def __close_source(self):
+        try:
+            self.source.close()
+        except BaseException as ex:
+            logger.error(f'camera ({self.name}) source could not be released, err: {ex}')
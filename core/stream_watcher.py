@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Callable, Dict, List
+from redis import Redis
+
+from common.utilities import logger
+from core.data.reader_version_repository import ReaderVersionRepository
+from core.reader_args import ReaderArgs
+
+
+# applies the changes of the streams without restarting the other readers. A change on streams:* (keyspace notification) or a message on
+# the streams_changed channel triggers a diff between the streams and the running readers, the interval is a safety net for both.
+# only the affected cameras are started, or stopped by changing their version (the readers stop themselves when their version changes).
+class StreamWatcher:
+    def __init__(self, connection: Redis, versions: ReaderVersionRepository, load_args: Callable[[], List[ReaderArgs]],
+                 start_reader: Callable[[ReaderArgs], None], interval: float, restart_timeout: float, debounce: float = 1.):
+        self.connection = connection
+        self.versions = versions
+        self.load_args = load_args
+        self.start_reader = start_reader
+        self.interval = interval
+        self.restart_timeout = restart_timeout
+        self.debounce = debounce
+        self.changed = threading.Event()
+
+    def start(self):
+        for target in [self.__listen, self.__loop]:
+            th = threading.Thread(target=target)
+            th.daemon = True
+            th.start()
+
+    def __listen(self):
+        while True:
+            try:
+                pub_sub = self.connection.pubsub(ignore_subscribe_messages=True)
+                db = self.connection.connection_pool.connection_kwargs.get('db', 0)
+                pub_sub.psubscribe(f'__keyspace@{db}__:streams:*')
+                pub_sub.subscribe('streams_changed')
+                for _ in pub_sub.listen():
+                    self.changed.set()
+            except BaseException as ex:
+                logger.error(f'stream watcher subscription has been failed, err: {ex}')
+                time.sleep(self.interval)
+
+    def __loop(self):
+        while True:
+            if self.changed.wait(self.interval):
+                time.sleep(self.debounce)  # a stream is saved by a few commands
+            self.changed.clear()
+            try:
+                self.sync()
+            except BaseException as ex:
+                logger.error(f'an error occurred while applying the stream changes, err: {ex}')
+
+    def sync(self):
+        desired: Dict[str, ReaderArgs] = {args.identifier: args for args in self.load_args()}
+        current = self.versions.get_all()
+        for identifier in list(current.keys()):
+            if identifier not in desired:
+                self.versions.remove(identifier)
+                logger.warning(f'camera ({identifier}) has been removed or disabled, its reader will stop')
+        for identifier, args in desired.items():
+            version = args.get_version()
+            previous = current.get(identifier)
+            if previous == version:
+                continue
+            self.versions.set(identifier, version)
+            if previous is None:
+                self.start_reader(args)
+                logger.warning(f'camera ({args.name}) has been added, its reader has been started')
+            else:
+                # the previous reader releases its resources (i.e. the frame ring) before the new one starts
+                th = threading.Thread(target=self.__restart_reader, args=(args, version, previous))
+                th.daemon = True
+                th.start()
+                logger.warning(f'camera ({args.name}) has been reconfigured, its reader will be restarted once the previous one has exited')
+
+    def __restart_reader(self, args: ReaderArgs, version: str, previous: str):
+        started_at = time.time()
+        while True:
+            try:
+                if self.versions.get(args.identifier) != version:  # it has been changed again meanwhile
+                    return
+                if not self.versions.is_running(args.identifier, previous):
+                    break
+            except BaseException as ex:
+                logger.error(f'an error occurred while waiting for the previous reader of camera ({args.name}), err: {ex}')
+            # the marker of a reader whose process has died is never removed
+            if time.time() - started_at > self.restart_timeout:
+                logger.error(f'the previous reader of camera ({args.name}) has not exited in {self.restart_timeout}s, it is assumed to be dead')
+                break
+            time.sleep(1.)
+        try:
+            self.start_reader(args)
+        except BaseException as ex:
+            logger.error(f'an error occurred while restarting the reader of camera ({args.name}), err: {ex}')
@@ -1,4 +1,5 @@
-from common.data.source_model import MediaServerType, SourceModel, StreamType, RecordFileTypes, SnapshotType, FlvPlayerType, Go2RtcPlayerMode
+from common.data.source_model import MediaServerType, SourceModel, StreamType, RecordFileTypes, SnapshotType, FlvPlayerType, Go2RtcPlayerMode, \
+    ChromaSubsampling, RtspTransport, MotionDetectionType, SnapshotEncoder
 from common.utilities import datetime_now
 
 
@@ -9,6 +10,9 @@ class StreamModel:
         self.brand: str = ''
         self.name: str = ''
         self.address: str = ''
+        self.rtsp_transport: RtspTransport = RtspTransport.Auto
+        self.analyzation_duration: int = 1000000
+        self.probe_size: int = 1000000
 
         self.ms_feeder_pid: int = 0  # ms prefix is for media server.
         self.ms_feeder_args: str = ''
@@ -45,6 +49,18 @@ class StreamModel:
         self.snapshot_frame_rate: int = 1
         self.snapshot_width: int = 640
         self.snapshot_height: int = 360
+        self.snapshot_quality: int = 95
+        self.snapshot_progressive: bool = False
+        self.snapshot_optimize: bool = False
+        self.snapshot_chroma_subsampling: ChromaSubsampling = ChromaSubsampling.Auto
+        self.snapshot_byte_budget: int = 0
+        self.snapshot_encoder: SnapshotEncoder = SnapshotEncoder.Jpeg
+        self.snapshot_png_compression: int = 1
+        self.md_type: MotionDetectionType = MotionDetectionType.OpenCV
+        self.md_opencv_threshold: int = 30
+        self.md_contour_area_limit: int = 10000
+        self.md_imagehash_threshold: int = 3
+        self.md_psnr_threshold: float = 0.2
 
         self.ai_clip_enabled: bool = False
 
@@ -65,6 +81,9 @@ class StreamModel:
         self.brand = source.brand
         self.name = source.name
         self.address = source.address
+        self.rtsp_transport = source.rtsp_transport
+        self.analyzation_duration = source.analyzation_duration
+        self.probe_size = source.probe_size
 
         self.ms_type = source.ms_type
         self.stream_type = source.stream_type
@@ -78,6 +97,18 @@ class StreamModel:
         self.snapshot_frame_rate: int = source.snapshot_frame_rate
         self.snapshot_width: int = source.snapshot_width
         self.snapshot_height: int = source.snapshot_height
+        self.snapshot_quality = source.snapshot_quality
+        self.snapshot_progressive = source.snapshot_progressive
+        self.snapshot_optimize = source.snapshot_optimize
+        self.snapshot_chroma_subsampling = source.snapshot_chroma_subsampling
+        self.snapshot_byte_budget = source.snapshot_byte_budget
+        self.snapshot_encoder = source.snapshot_encoder
+        self.snapshot_png_compression = source.snapshot_png_compression
+        self.md_type = source.md_type
+        self.md_opencv_threshold = source.md_opencv_threshold
+        self.md_contour_area_limit = source.md_contour_area_limit
+        self.md_imagehash_threshold = source.md_imagehash_threshold
+        self.md_psnr_threshold = source.md_psnr_threshold
 
         # noinspection DuplicatedCode
         self.record_enabled = source.record_enabled
@@ -1,5 +1,5 @@
 from redis import Redis
-from typing import List
+from typing import Iterator, List
 
 from common.data.base_repository import BaseRepository
 from stream.stream_model import StreamModel
@@ -33,13 +33,11 @@ class StreamRepository(BaseRepository):
         return model
 
     def get_all(self) -> List[StreamModel]:
-        models: List[StreamModel] = []
-        keys = self.connection.keys(self.namespace + '*')
-        for key in keys:
-            dic = self.connection.hgetall(key)
-            model: StreamModel = self.from_redis(StreamModel(), dic)
-            models.append(model)
-        return models
+        return [self.from_redis(StreamModel(), dic) for dic in self._get_all_hashes()]
+
+    def iter_all(self) -> Iterator[StreamModel]:
+        for dic in self._iter_all_hashes():
+            yield self.from_redis(StreamModel(), dic)
 
     def delete_by_namespace(self) -> int:
         result = 0